@@ -1,9 +1,18 @@
+from collections import OrderedDict
+
+import numpy as np
+
 from gameState import GameState
 from debugServer import DebugServer
-from utils import get_walkable_tiles, get_distance
+from DistMatrix import RoutingTable
+from MazeIndex import getMazeIndex
+from utils import get_distance
+
+# Number of ghost threat fields kept, most recently used first (a few frames of all four ghosts)
+GHOST_FIELD_CACHE_SIZE = 64
 
 class cellAvoidanceMap:
-    def __init__(self, g: GameState, hybrid_mode: bool = False):
+    def __init__(self, g: GameState, hybrid_mode: bool = False, incremental: bool = True):
         """
         The cellAvoidanceMap is a map of the game board that assigns a score to each cell based on how desirable it is to move to that cell.
         The more negative the score, the more desirable the cell is.
@@ -12,10 +21,15 @@ class cellAvoidanceMap:
         @param:
             - g, GameState object: the current game state
             - hybrid_mode, bool: whether pacbot is running in RL hybrid mode
+            - incremental, bool: whether to only recompute the layers affected by changes between updates
         """
+        self.maze = getMazeIndex(tuple(g.wallArr)) # dense tile ids for the walkable cells
+        self.routes = RoutingTable(g) # maze distances between tiles, for ghost threats
+        self.scores = np.zeros(self.maze.num_tiles) # tile id -> avoidance score
         self.avoidance_map = {} # tuple (row, col) -> int
         self.g = g # the current game state
         self.hybrid_mode = hybrid_mode
+        self.incremental = incremental
         
         # All parameters listed as tunable should be experimented with to find the best values.
         self.pellet_boost = 50        # TUNABLE
@@ -24,6 +38,44 @@ class cellAvoidanceMap:
         self.ghost_boost = 1000       # TUNABLE
         self.ghost_threshold_dist = 8 # TUNABLE
         self.fruit_threshold_dist = 5 # TUNABLE
+
+        # preset routes for the very early game (pellet boost multipliers)
+        self.route_one = {
+            (23, 9): 12,
+            (26, 6): 10,
+            (29, 1): 8,
+            (29, 9): 6,
+            (29, 18): 4,
+            (29, 26): 2,
+        }
+
+        self.route_two = {
+            (23, 6): 10,
+            (15, 6): 8,
+            (8, 6): 6,
+            (8, 1): 4,
+        }
+
+        self.boosted_tiles = self.route_one
+
+        # Static per-tile arrays for the vectorized update
+        self._rows = self.maze.rows.astype(np.float64)
+        self._cols = self.maze.cols.astype(np.float64)
+        self._super_tiles = np.isin(self.maze.rows, (3, 23)) & np.isin(self.maze.cols, (1, 26))
+        self._route_multiplier = np.ones(self.maze.num_tiles, dtype=np.int64)
+        if not self.hybrid_mode:
+            for tile, multiplier in self.boosted_tiles.items():
+                self._route_multiplier[self.maze.tile_to_id[tile]] = multiplier
+
+        # Recent ghost threat fields, keyed by ghost position, fright state and thresholds
+        self._ghost_field_cache = OrderedDict()
+
+        # Cached contribution layers, each with the key of the inputs it was computed from
+        self.invalidate()
+        self.layer_stats = {'updates': 0, 'skipped': 0, 'ghost': 0, 'pellet_full': 0, 'pellet_incremental': 0, 'fruit': 0,
+                            'shown': 0, 'show_skipped': 0}
+        self._version = 0 # number of times the map was recomputed
+        self._shown_version = None # map version the debug server last showed
         
         self.updateMap(self.g) # calculate the avoidance map based on the current game state
         
@@ -51,54 +103,66 @@ class cellAvoidanceMap:
         
         # TODO: account for clusters of pellets
 
-        boost = self.pellet_boost
+        boost = self.pellet_boost * self.pellet_multiplier()
+
+        if not self.hybrid_mode and tile in self.boosted_tiles:
+            boost *= self.boosted_tiles[tile]
+
+        return boost
+
+    def pellet_multiplier(self):
+        """
+        Multiplier applied to the normal pellet boost, based on the number of remaining pellets.
+
+        @return:
+            - int: the multiplier
+        """
 
         # Aggressively boost pellet collection when few pellets remain
         # This could instead be a smooth exponential function.
         # The number of pellets at the beginning of a level is 240 for context.
         if self.num_pellets < 4:
-            boost *= 50
+            return 50
         elif self.num_pellets < 6:
-            boost *= 20
+            return 20
         elif self.num_pellets < 8:
-            boost *= 10
+            return 10
         elif self.num_pellets < 10:
-            boost *= 5
+            return 5
         elif self.num_pellets < 20:
-            boost *= 4
+            return 4
         elif self.num_pellets < 50:
-            boost *= 3
+            return 3
         elif self.num_pellets < 100:
-            boost *= 2
-            
-        # preset routes for the very early game
-            
-        route_one = {
-            (23, 9): 12,
-            (26, 6): 10,
-            (29, 1): 8,
-            (29, 9): 6,
-            (29, 18): 4,
-            (29, 26): 2,
-        }
-        
-        route_two = {
-            (23, 6): 10,
-            (15, 6): 8,
-            (8, 6): 6,
-            (8, 1): 4,
-        }
-        
-        boosted_tiles = route_one
+            return 2
+        return 1
+    
+    def ghost_distances(self, ghost):
+        """
+        Maze distances from a ghost to every tile: a row of the distance table.
+        Ghosts inside the ghost house are routed through its exit.
 
-        if not self.hybrid_mode and tile in boosted_tiles:
-            boost *= boosted_tiles[tile]
+        @param:
+            - ghost, Ghost object: the ghost to calculate the distances for
+
+        @return:
+            - np.ndarray: the distance to each tile id, or None if the ghost is not on the board
+        """
+
+        row, col = ghost.location.row, ghost.location.col
+        idx = self.maze.id_of(row, col)
+        if idx >= 0:
+            return self.routes.distTable[idx].astype(np.float64)
+
+        steps = self.maze.house_steps.get((row, col))
+        if steps is not None: # inside the ghost house
+            return self.routes.distTable[self.maze.house_door] + float(steps)
+
+        return None
 
-        return boost
-    
     def calculate_ghost_proximity(self, tile, ghost):
         """
-        Calculate the proximity influence for a ghost at a given tile based on distance and ghost color.
+        Calculate the proximity influence for a ghost at a given tile based on maze distance and ghost color.
         
         @param:
             - tile, tuple: the tile to calculate the ghost proximity for, in the form (row, col)
@@ -110,7 +174,11 @@ class cellAvoidanceMap:
         
         # TODO: use Ghost.guessPlan in gameState.py to account for differing ghost behaviors
         
-        dist = get_distance(tile, (ghost.location.row, ghost.location.col))
+        distances = self.ghost_distances(ghost)
+        if distances is None: # ghost is not on the board
+            return 0
+
+        dist = distances[self.maze.tile_to_id[tile]]
         fright_modifier = -1 if ghost.isFrightened() else 1
         ghost_proximity = 0
         
@@ -143,28 +211,254 @@ class cellAvoidanceMap:
                 
         return fruit_boost
     
-    def updateMap(self, g: GameState):
+    def ghost_field(self, ghost):
+        """
+        Vectorized calculate_ghost_proximity: the proximity influence of one ghost on every tile.
+        The most recent fields are cached per ghost position, and must not be modified by the caller.
+
+        @param:
+            - ghost, Ghost object: the ghost to calculate the proximity for
+
+        @return:
+            - np.ndarray: the ghost proximity score for each tile id
+        """
+
+        key = (ghost.location.row, ghost.location.col, ghost.isFrightened(), self.num_pellets < 10,
+               self.ghost_boost, self.ghost_threshold_dist)
+        field = self._ghost_field_cache.get(key)
+        if field is not None:
+            self._ghost_field_cache.move_to_end(key)
+            return field
+
+        dist = self.ghost_distances(ghost)
+        if dist is None: # ghost is not on the board
+            field = np.zeros(self.maze.num_tiles)
+        else:
+            fright_modifier = -1 if ghost.isFrightened() else 1
+            near = (dist < self.ghost_threshold_dist) | ((self.num_pellets < 10) & (dist < self.ghost_threshold_dist / 2))
+            proximity = np.divide(self.ghost_boost, 4 * dist, out=np.full_like(dist, self.ghost_boost), where=(dist != 0)) # TUNABLE
+            field = np.where(near, proximity, 0.0) * fright_modifier
+
+        self._ghost_field_cache[key] = field
+        if len(self._ghost_field_cache) > GHOST_FIELD_CACHE_SIZE:
+            self._ghost_field_cache.popitem(last=False) # least recently used
+        return field
+
+    def pellet_field(self):
+        """
+        Vectorized calculate_pellet_boost: the pellet and super pellet boost of every tile.
+
+        @return:
+            - np.ndarray: the pellet boost for each tile id
+        """
+
+        pellets = ((np.array(self.g.pelletArr, dtype=np.int64)[self.maze.rows] >> self.maze.cols) & 1).astype(bool)
+        superPellet_boost = self.superPellet_boost if self.num_pellets <= 200 else -self.superPellet_boost # negative because we want to avoid it in the early game
+
+        boost = np.where(pellets, self.pellet_boost * self.pellet_multiplier() * self._route_multiplier, 0)
+        return np.where(pellets & self._super_tiles, superPellet_boost, boost)
+
+    def fruit_field(self):
+        """
+        Vectorized calculate_fruit_boost: the fruit boost of every tile.
+
+        @return:
+            - np.ndarray: the fruit boost for each tile id
+        """
+
+        if not self.g.fruitAt(self.g.fruitLoc.row, self.g.fruitLoc.col): # if there is no fruit on the board
+            return np.zeros(self.maze.num_tiles)
+
+        drow = self._rows - self.g.fruitLoc.row
+        dcol = self._cols - self.g.fruitLoc.col
+        dist = np.sqrt(dcol * dcol + drow * drow)
+        boost = self.fruit_boost * ((self.g.fruitSteps + self.g.fruitDuration) / self.g.fruitDuration)
+
+        scaled = np.divide(boost, dist * 2, out=np.full_like(dist, boost), where=(dist != 0)) # TUNABLE
+        return np.where(dist < self.fruit_threshold_dist, scaled, 0.0)
+
+    def invalidate(self):
+        """ Drop all cached layers, so that the next update rebuilds the whole map. """
+
+        self._frame = None # game state frame the map was last computed for
+        self._ghost_keys = [None] * 4
+        self._ghost_layers = [None] * 4
+        self._ghost_total = None
+        self._pellet_key = None
+        self._pellet_arr = None
+        self._pellet_layer = None
+        self._fruit_key = None
+        self._fruit_layer = None
+
+    def _update_ghost_layers(self):
+        """
+        Recompute the proximity layer of each ghost whose position, fright state or thresholds changed.
+        @return:
+            - bool: whether any ghost layer changed
+        """
+
+        changed = False
+        for i, ghost in enumerate(self.ghosts):
+            key = (ghost.location.row, ghost.location.col, ghost.isFrightened(), self.num_pellets < 10,
+                   self.ghost_boost, self.ghost_threshold_dist)
+            if key != self._ghost_keys[i]:
+                self._ghost_keys[i] = key
+                self._ghost_layers[i] = self.ghost_field(ghost)
+                self.layer_stats['ghost'] += 1
+                changed = True
+
+        if changed:
+            self._ghost_total = sum(self._ghost_layers)
+        return changed
+
+    def _update_pellet_layer(self):
+        """
+        Update the pellet layer. Eaten pellets are cleared tile by tile; a full rebuild happens when
+        pellets reappear (new level) or when a pellet-count threshold changes the boosts of every tile.
+        @return:
+            - bool: whether the pellet layer changed
+        """
+
+        key = (self.pellet_multiplier(), self.num_pellets <= 200, self.pellet_boost, self.superPellet_boost)
+        pelletArr = tuple(self.g.pelletArr) # snapshot, as the game state updates its pellets in place
+
+        if key == self._pellet_key:
+            if pelletArr == self._pellet_arr:
+                return False
+
+            eaten = []
+            for row, (old, new) in enumerate(zip(self._pellet_arr, pelletArr)):
+                if new & ~old: # pellets were added, rebuild everything
+                    eaten = None
+                    break
+                removed = old & ~new
+                while removed:
+                    col = (removed & -removed).bit_length() - 1
+                    eaten.append(self.maze.id_grid[row, col])
+                    removed &= removed - 1
+
+            if eaten is not None:
+                self._pellet_layer[[idx for idx in eaten if idx >= 0]] = 0
+                self._pellet_arr = pelletArr
+                self.layer_stats['pellet_incremental'] += 1
+                return True
+
+        self._pellet_key = key
+        self._pellet_arr = pelletArr
+        self._pellet_layer = self.pellet_field()
+        self.layer_stats['pellet_full'] += 1
+        return True
+
+    def _update_fruit_layer(self):
+        """
+        Recompute the fruit layer if the fruit appeared, moved, aged or disappeared.
+        @return:
+            - bool: whether the fruit layer changed
+        """
+
+        present = self.g.fruitAt(self.g.fruitLoc.row, self.g.fruitLoc.col)
+        key = (present, self.g.fruitLoc.row, self.g.fruitLoc.col, self.g.fruitSteps, self.g.fruitDuration,
+               self.fruit_boost, self.fruit_threshold_dist) if present else (present,)
+        if key == self._fruit_key:
+            return False
+
+        self._fruit_key = key
+        self._fruit_layer = self.fruit_field()
+        self.layer_stats['fruit'] += 1
+        return True
+
+    def updateMap(self, g: GameState, force: bool = False):
         """
         Calculate the avoidance map given the current state of the game.
+        The scores are computed for all tiles at once, as arrays over the MazeIndex tile ids.
+        In incremental mode, only the layers whose inputs changed since the last update are recomputed.
+        Repeated calls for the same game state frame return immediately (counted in layer_stats['skipped']).
         @param: 
             - g, GameState object
+            - force, bool: recompute even if the map is up to date for this frame (e.g. after changing tunables)
         """
+
+        if not force and g is self.g and g.frameCount == self._frame:
+            self.layer_stats['skipped'] += 1
+            return
         
         self.g = g
-        self.avoidance_map = {}
         self.ghosts = self.g.ghosts
         self.num_pellets = self.g.numPellets()
+        self.layer_stats['updates'] += 1
+        self._version += 1
+
+        if not self.incremental:
+            self.invalidate()
+        self._frame = g.frameCount
+
+        changed = self._update_ghost_layers()
+        changed = self._update_pellet_layer() or changed
+        changed = self._update_fruit_layer() or changed
+        if not changed:
+            return
+
+        # this is the *avoidance* score, so the more positive the more we want to avoid it
+        scores = self._ghost_total - self._pellet_layer - self._fruit_layer
+
+        if len(self.avoidance_map) != self.maze.num_tiles:
+            self.avoidance_map = dict(zip(self.maze.tiles, scores.tolist()))
+        else:
+            diff = np.flatnonzero(scores != self.scores)
+            for idx, score in zip(diff.tolist(), scores[diff].tolist()):
+                self.avoidance_map[self.maze.tiles[idx]] = score
+        self.scores = scores
+
+    def ghost_free(self, path):
+        """
+        Whether no ghost field reaches any tile of a path (as of the last update).
+        @param:
+            - path, list: the (row, col) tiles of the path
+        @return:
+            - bool: True if every tile has a zero ghost proximity score
+        """
 
-        for tile in get_walkable_tiles(g): # we don't need to calculate an avoidance score for walls
+        ids = [self.maze.tile_to_id[tile] for tile in path]
+        return not self._ghost_total[ids].any()
+
+    def updateMapPerTile(self, g: GameState):
+        """
+        Reference implementation of updateMap, calling the per-tile helpers for every tile.
+        Kept for validating and benchmarking the vectorized version.
+        @param: 
+            - g, GameState object
+        """
+        
+        self.g = g
+        self.ghosts = self.g.ghosts
+        self.num_pellets = self.g.numPellets()
+
+        scores = []
+        for tile in self.maze.tiles: # we don't need to calculate an avoidance score for walls
             ghost_proximity = sum(self.calculate_ghost_proximity(tile, ghost) for ghost in self.ghosts)
             pellet_boost = self.calculate_pellet_boost(tile)
             fruit_boost = self.calculate_fruit_boost(tile)
 
-            self.avoidance_map[tile] = ghost_proximity - pellet_boost - fruit_boost # this is the *avoidance* score, so the more positive the more we want to avoid it
+            scores.append(ghost_proximity - pellet_boost - fruit_boost) # this is the *avoidance* score, so the more positive the more we want to avoid it
+
+        self.scores = np.array(scores, dtype=np.float64)
+        self.avoidance_map = dict(zip(self.maze.tiles, scores))
+        self.invalidate()
+        self._version += 1
     
     def show_map(self):
-        """ Show the avoidance map on the debug server (in the terminal). """
-        
+        """
+        Show the avoidance map on the debug server (in the terminal).
+        Calls until the map is next recomputed return immediately (counted in layer_stats['show_skipped']),
+        so showing it once per caller costs nothing within a frame.
+        """
+
+        if self._version == self._shown_version:
+            self.layer_stats['show_skipped'] += 1
+            return
+        self._shown_version = self._version
+        self.layer_stats['shown'] += 1
+
         new_cell_colors = []
         for cell, score in self.avoidance_map.items():
             score = min(max(-255, score), 255)
@@ -0,0 +1,435 @@
+import numpy as np
+
+from gameState import GameState, GameModes, Directions, D_ROW, D_COL, SCATTER_ROW, SCATTER_COL, reversedDirections
+from gameState import createGhostPlanTable, PLAN_GRID_OFFSET, PLAN_GRID_SIZE, PLAN_REACH, PLAN_SPAN
+from MazeIndex import getMazeIndex, HEIGHT, WIDTH
+
+# Per-direction tables, indexed by Directions value (UP, LEFT, DOWN, RIGHT, NONE)
+DIR_ROW = np.array(D_ROW)
+DIR_COL = np.array(D_COL)
+DIR_REVERSED = np.array([reversedDirections[Directions(d)] for d in range(len(D_ROW))])
+
+# Ghost plans are chosen among these directions, in this order of preference for ties
+PLAN_DIRECTIONS = (Directions.UP, Directions.LEFT, Directions.DOWN, Directions.RIGHT)
+PLAN_ROW = DIR_ROW[list(PLAN_DIRECTIONS)]
+PLAN_COL = DIR_COL[list(PLAN_DIRECTIONS)]
+
+# Distance of the moves ruled out by a wall or a reversal, as the initial minDist of Ghost.guessPlanScan
+NO_DIST = 0xfffffff
+
+# Plain int values of the enums used in the hot loops
+UP, NONE = int(Directions.UP), int(Directions.NONE)
+SCATTER, CHASE = int(GameModes.SCATTER), int(GameModes.CHASE)
+
+# Row and column of an empty (off the board) location
+EMPTY = 32
+
+# Margin of walls around the padded wall grid
+WALL_PAD = 8
+
+
+class BatchSimulator:
+    def __init__(self, states: list[GameState]):
+        """
+        Batched version of GameState.simulateAction: holds N game states ("lanes") as
+        NumPy arrays and advances all of them at once, with the same ghost prediction,
+        mode, pellet, fruit and collision rules as the single-state simulator.
+        Rows of the (N, 4) ghost arrays are in GhostColors order.
+
+        @param:
+            - states, list[GameState]: the initial state of each lane (left untouched);
+              pass the same state N times to branch N rollouts from it
+        """
+        self.states = states
+        self.numLanes = len(states)
+        self.walls = getMazeIndex(tuple(states[0].wallArr)).walls
+
+        # Wall grid surrounded by walls, so that wallAt is a single lookup for any
+        # position that fits in a Location (6-bit rows and columns, plus two steps)
+        self.paddedWalls = np.ones((64 + 2 * WALL_PAD, 64 + 2 * WALL_PAD), dtype=bool)
+        self.paddedWalls[WALL_PAD:WALL_PAD + HEIGHT, WALL_PAD:WALL_PAD + WIDTH] = self.walls
+
+        # Ghost plan table of Ghost.guessPlan, as arrays
+        moveBase, planTable = createGhostPlanTable(tuple(states[0].wallArr))
+        self.planMoveBase = np.array(moveBase, dtype=np.int64)
+        self.planTable = np.frombuffer(planTable, dtype=np.uint8)
+
+        # Lanes branched from the same state are read from it only once
+        starts = list({id(g): g for g in states}.values())
+        startIndex = {id(g): i for i, g in enumerate(starts)}
+        laneStart = np.array([startIndex[id(g)] for g in states], dtype=np.int64)
+
+        def lanes(fn, dtype=np.int64):
+            return np.array([fn(g) for g in starts], dtype=dtype)[laneStart]
+
+        def ghosts(fn, dtype=np.int64):
+            return np.array([[fn(ghost) for ghost in g.ghosts] for g in starts], dtype=dtype)[laneStart]
+
+        # General game info
+        self.currTicks = lanes(lambda g: g.currTicks)
+        self.updatePeriod = lanes(lambda g: g.updatePeriod)
+        self.gameMode = lanes(lambda g: g.gameMode)
+        self.modeSteps = lanes(lambda g: g.modeSteps)
+        self.modeDuration = lanes(lambda g: g.modeDuration)
+        self.currScore = lanes(lambda g: g.currScore)
+
+        # Pacman
+        self.pacmanRow = lanes(lambda g: g.pacmanLoc.row)
+        self.pacmanCol = lanes(lambda g: g.pacmanLoc.col)
+        self.pacmanRowDir = lanes(lambda g: g.pacmanLoc.rowDir)
+        self.pacmanColDir = lanes(lambda g: g.pacmanLoc.colDir)
+
+        # Ghosts
+        self.ghostRow = ghosts(lambda ghost: ghost.location.row)
+        self.ghostCol = ghosts(lambda ghost: ghost.location.col)
+        self.ghostRowDir = ghosts(lambda ghost: ghost.location.rowDir)
+        self.ghostColDir = ghosts(lambda ghost: ghost.location.colDir)
+        self.frightSteps = ghosts(lambda ghost: ghost.frightSteps)
+        self.spawning = ghosts(lambda ghost: ghost.spawning, dtype=bool)
+        self.plannedDirection = ghosts(lambda ghost: ghost.plannedDirection)
+
+        # Fruit
+        self.fruitRow = lanes(lambda g: g.fruitLoc.row)
+        self.fruitCol = lanes(lambda g: g.fruitLoc.col)
+        self.fruitSteps = lanes(lambda g: g.fruitSteps)
+
+        # Pellet bitboards (one 32-bit row per entry) and the number of pellets left
+        self.pelletArr = np.array([list(g.pelletArr) for g in starts], dtype=np.int64)[laneStart]
+        self.pelletCount = np.bitwise_count(self.pelletArr).sum(axis=1).astype(np.int64)
+
+        # Lanes that have not collided with a ghost yet
+        self.alive = np.ones(self.numLanes, dtype=bool)
+
+    def wallAt(self, row, col):
+        """
+        Vectorized GameState.wallAt (positions off the grid count as walls).
+        """
+        return self.paddedWalls[row + WALL_PAD, col + WALL_PAD]
+
+    def numPellets(self):
+        """
+        Number of pellets left in each lane.
+        """
+        return self.pelletCount
+
+    def guessPlan(self, mask):
+        """
+        Vectorized Ghost.guessPlan for the (lane, ghost) pairs selected by mask,
+        looking the plans up in the ghost plan table (see createGhostPlanTable).
+
+        @param:
+            - mask, np.ndarray: (N, 4) bool, which ghosts to plan for
+        """
+        row, col = self.ghostRow, self.ghostCol
+        rowDir, colDir = self.ghostRowDir, self.ghostColDir
+        mask = mask & ~self.spawning & (row < EMPTY) & (col < EMPTY)
+        if not mask.any():
+            return
+
+        # Row and column at the next step, and the target relative to it
+        nextRow = row + rowDir
+        nextCol = col + colDir
+        targetRow, targetCol = self.planTargets(nextRow, nextCol)
+        relRow = targetRow - nextRow
+        relCol = targetCol - nextCol
+
+        # Block of the moves allowed from the next step, then the plan for the target
+        # (indices are clipped for the ghosts that are not planned for)
+        gridRow = np.clip(nextRow + PLAN_GRID_OFFSET, 0, PLAN_GRID_SIZE - 1)
+        gridCol = np.clip(nextCol + PLAN_GRID_OFFSET, 0, PLAN_GRID_SIZE - 1)
+        block = self.planMoveBase[((gridRow * PLAN_GRID_SIZE + gridCol) * 4 + np.clip(rowDir + 2, 0, 3)) * 4 +
+                                  np.clip(colDir + 2, 0, 3)]
+        block += (self.frightSteps > 0) * (PLAN_SPAN * PLAN_SPAN)
+        plan = self.planTable[block + np.clip(relRow, -PLAN_REACH, PLAN_REACH) * PLAN_SPAN +
+                              np.clip(relCol, -PLAN_REACH, PLAN_REACH)].astype(np.int64)
+
+        # Targets beyond the table's reach (never seen in a real game) are scanned
+        inReach = (np.abs(relRow) <= PLAN_REACH) & (np.abs(relCol) <= PLAN_REACH)
+        if not inReach[mask].all():
+            plan = np.where(inReach, plan, self.scanPlan(nextRow, nextCol, rowDir, colDir, targetRow, targetCol))
+
+        self.plannedDirection = np.where(mask, plan, self.plannedDirection)
+
+    def planTargets(self, nextRow, nextCol):
+        """
+        Vectorized Ghost.target: the target of every ghost, planning from its next step.
+
+        @return:
+            - np.ndarray, np.ndarray: (N, 4) target rows and columns
+        """
+        # Pacman and red ghost positions, broadcast against the ghosts
+        pacmanRow, pacmanCol = self.pacmanRow[:, None], self.pacmanCol[:, None]
+        pacmanRowDir, pacmanColDir = self.pacmanRowDir[:, None], self.pacmanColDir[:, None]
+        redRow, redCol = self.ghostRow[:, :1], self.ghostCol[:, :1]
+
+        # Chase targets: red targets Pacman, pink 4 spaces ahead of Pacman, cyan the
+        # red ghost reflected about 2 spaces ahead of Pacman, orange Pacman when close
+        distSqToPacman = (nextRow[:, 3:] - pacmanRow) ** 2 + (nextCol[:, 3:] - pacmanCol) ** 2
+        orangeNear = distSqToPacman < 64
+        chaseRow = np.hstack([
+            pacmanRow,
+            pacmanRow + 4 * pacmanRowDir,
+            2 * pacmanRow + 4 * pacmanRowDir - redRow,
+            np.where(orangeNear, pacmanRow, SCATTER_ROW[3]),
+        ])
+        chaseCol = np.hstack([
+            pacmanCol,
+            pacmanCol + 4 * pacmanColDir,
+            2 * pacmanCol + 4 * pacmanColDir - redCol,
+            np.where(orangeNear, pacmanCol, SCATTER_COL[3]),
+        ])
+
+        # Scatter targets are fixed corners; paused games target (0, 0)
+        mode = self.gameMode[:, None]
+        targetRow = np.where(mode == CHASE, chaseRow, 0)
+        targetCol = np.where(mode == CHASE, chaseCol, 0)
+        targetRow = np.where(mode == SCATTER, np.array(SCATTER_ROW), targetRow)
+        targetCol = np.where(mode == SCATTER, np.array(SCATTER_COL), targetCol)
+        return targetRow, targetCol
+
+    def scanPlan(self, nextRow, nextCol, rowDir, colDir, targetRow, targetCol):
+        """
+        Vectorized Ghost.guessPlanScan: the plan of every ghost, comparing the distances
+        to its target of all its moves.
+
+        @return:
+            - np.ndarray: (N, 4) planned directions
+        """
+        # Distance squared to the target, for all 4 moves (no reversals, no walls),
+        # along a last axis in PLAN_DIRECTIONS order
+        newRow = nextRow[..., None] + PLAN_ROW
+        newCol = nextCol[..., None] + PLAN_COL
+        valid = ((PLAN_ROW + rowDir[..., None] != 0) | (PLAN_COL + colDir[..., None] != 0)) & \
+            ~self.wallAt(newRow, newCol)
+        distSqToTarget = (newRow - targetRow[..., None]) ** 2 + (newCol - targetCol[..., None]) ** 2
+        distSqToTarget = np.where(valid, distSqToTarget, NO_DIST)
+
+        # Closest move: the first strict minimum, as in Ghost.guessPlanScan
+        minDir = np.where(valid.any(axis=-1), distSqToTarget.argmin(axis=-1), UP)
+
+        # Farthest move: moves that improved on the running minimum are never
+        # considered for the maximum, and later ties win
+        runningMin = np.minimum.accumulate(distSqToTarget, axis=-1)
+        improved = distSqToTarget < np.concatenate([np.full(runningMin.shape[:-1] + (1,), NO_DIST),
+                                                    runningMin[..., :-1]], axis=-1)
+        candidates = np.where(valid & ~improved, distSqToTarget, -1)
+        lastMax = 3 - candidates[..., ::-1].argmax(axis=-1)
+        maxDir = np.where((candidates >= 0).any(axis=-1), lastMax, UP)
+
+        return np.where(self.frightSteps > 0, maxDir, minDir)
+
+    def moveGhosts(self, lanes):
+        """
+        Vectorized Ghost.move for every ghost of the selected lanes.
+
+        @param:
+            - lanes, np.ndarray: (N,) bool, which lanes to update
+        """
+        moving = lanes[:, None] & ~self.spawning
+
+        # Advance along the current direction, unless off the board or blocked
+        newRow = self.ghostRow + self.ghostRowDir
+        newCol = self.ghostCol + self.ghostColDir
+        advance = moving & (self.ghostRow <= 31) & (self.ghostCol <= 28) & ~self.wallAt(newRow, newCol)
+        self.ghostRow = np.where(advance, newRow, self.ghostRow)
+        self.ghostCol = np.where(advance, newCol, self.ghostCol)
+
+        # Turn towards the planned direction, and count down fright
+        self.ghostRowDir = np.where(moving, DIR_ROW[self.plannedDirection], self.ghostRowDir)
+        self.ghostColDir = np.where(moving, DIR_COL[self.plannedDirection], self.ghostColDir)
+        self.frightSteps = np.where(moving & (self.frightSteps > 0), self.frightSteps - 1, self.frightSteps)
+
+    def safetyCheck(self, lanes):
+        """
+        Vectorized GameState.safetyCheck: frightened ghosts on Pacman's tile are
+        sent back to spawn, non-frightened ones make the lane unsafe.
+
+        @param:
+            - lanes, np.ndarray: (N,) bool, which lanes to check
+        @return:
+            - np.ndarray: (N,) bool, False for the checked lanes where Pacman was caught
+        """
+        onBoard = (self.pacmanRow < HEIGHT) & (self.pacmanCol < WIDTH)
+        collide = (lanes & onBoard)[:, None] & \
+            (self.ghostRow == self.pacmanRow[:, None]) & (self.ghostCol == self.pacmanCol[:, None])
+        deadly = collide & (self.frightSteps == 0)
+        safe = ~deadly.any(axis=1)
+
+        # Ghosts are checked in color order, so only those before the first deadly one are eaten
+        firstDeadly = np.where(safe, 4, deadly.argmax(axis=1))
+        eaten = collide & (self.frightSteps > 0) & (np.arange(4)[None, :] < firstDeadly[:, None])
+        self.ghostRow[eaten] = EMPTY
+        self.ghostCol[eaten] = EMPTY
+        self.spawning[eaten] = True
+
+        return safe
+
+    def collectFruit(self, lanes):
+        """
+        Vectorized GameState.collectFruit at Pacman's position.
+        """
+        eat = lanes & (self.fruitSteps > 0) & (self.fruitRow == self.pacmanRow) & (self.fruitCol == self.pacmanCol)
+        self.currScore[eat] += 100
+        self.fruitSteps[eat] = 0
+
+        countdown = lanes & (self.fruitSteps > 0)
+        self.fruitSteps[countdown] -= 1
+
+        despawn = lanes & (self.fruitSteps == 0)
+        self.fruitRow[despawn] = EMPTY
+        self.fruitCol[despawn] = EMPTY
+
+    def collectPellet(self, lanes):
+        """
+        Vectorized GameState.collectPellet at Pacman's position.
+        """
+        row, col = self.pacmanRow, self.pacmanCol
+        onBoard = ~self.wallAt(row, col)
+        bits = self.pelletArr[np.arange(self.numLanes), np.clip(row, 0, HEIGHT - 1)]
+        eat = lanes & onBoard & (((bits >> np.clip(col, 0, 31)) & 1) == 1)
+        if not eat.any():
+            return
+
+        superPellet = eat & ((row == 3) | (row == 23)) & ((col == 1) | (col == 26))
+
+        # Remove the pellet, and increase the score
+        idx = np.flatnonzero(eat)
+        self.pelletArr[idx, row[idx]] &= ~(1 << col[idx])
+        self.pelletCount[idx] -= 1
+        self.currScore[idx] += np.where(superPellet[idx], 50, 10)
+
+        # Spawn the fruit based on the number of pellets, if applicable
+        fruit = eat & ((self.pelletCount == 174) | (self.pelletCount == 74))
+        self.fruitSteps[fruit] = 30
+        self.fruitRow[fruit] = 17
+        self.fruitCol[fruit] = 13
+
+        # When <= 20 pellets are left, keep the game in chase mode
+        chase = eat & (self.pelletCount <= 20) & (self.gameMode == SCATTER)
+        self.gameMode[chase] = CHASE
+
+        # Scare the ghosts, if applicable
+        self.frightSteps[superPellet] = 40
+        self.plannedDirection[superPellet] = DIR_REVERSED[self.plannedDirection[superPellet]]
+
+    def simulateAction(self, numTicks: int, pacmanDirs):
+        """
+        Advance every live lane like GameState.simulateAction(numTicks, pacmanDir).
+        Lanes that were already caught are left unchanged.
+
+        @param:
+            - numTicks, int: number of ticks to advance
+            - pacmanDirs, Directions or np.ndarray: (N,) direction for Pacman in each lane
+        @return:
+            - np.ndarray: (N,) bool, whether the action was safe in each lane
+            - np.ndarray: (N,) int, the score gained in each lane
+        """
+        pacmanDirs = np.broadcast_to(np.asarray(pacmanDirs, dtype=np.int64), (self.numLanes,))
+        running = self.alive.copy()
+        safe = np.ones(self.numLanes, dtype=bool)
+        startScore = self.currScore.copy()
+
+        # Try to plan the ghost directions if we expect them to be none
+        self.guessPlan(running[:, None] & (self.plannedDirection == NONE))
+
+        for tick in range(1, numTicks + 1):
+
+            # Keep ticking until an update
+            updating = running & ((self.currTicks + tick) % self.updatePeriod == 0)
+            if not updating.any():
+                continue
+
+            # Update the ghost positions, and stop lanes where Pacman is caught
+            self.moveGhosts(updating)
+            caught = updating & ~self.safetyCheck(updating)
+            safe &= ~caught
+            running &= ~caught
+            updating &= ~caught
+
+            # Update the mode steps counter, and change the mode if necessary
+            self.modeSteps[updating & (self.modeSteps > 0)] -= 1
+            modeOver = updating & (self.modeSteps == 0)
+            toChase = modeOver & (self.gameMode == SCATTER)
+            toScatter = modeOver & (self.gameMode == CHASE) & (self.pelletCount > 20)
+            self.gameMode[toChase] = CHASE
+            self.modeSteps[toChase] = self.modeDuration[toChase] = 180
+            self.gameMode[toScatter] = SCATTER
+            self.modeSteps[toScatter] = self.modeDuration[toScatter] = 60
+
+            # Reverse the planned directions of all ghosts
+            self.plannedDirection[modeOver] = DIR_REVERSED[self.plannedDirection[modeOver]]
+
+            # Guess the next ghost moves
+            self.guessPlan(np.broadcast_to(updating[:, None], self.plannedDirection.shape))
+
+        # Lanes where Pacman is not given a direction are done
+        moving = running & (pacmanDirs != NONE)
+
+        # Set the direction of Pacman, and try to move one step
+        self.pacmanRowDir = np.where(moving, DIR_ROW[pacmanDirs], self.pacmanRowDir)
+        self.pacmanColDir = np.where(moving, DIR_COL[pacmanDirs], self.pacmanColDir)
+        newRow = self.pacmanRow + self.pacmanRowDir
+        newCol = self.pacmanCol + self.pacmanColDir
+        advance = moving & (self.pacmanRow <= 31) & (self.pacmanCol <= 28) & ~self.wallAt(newRow, newCol)
+        self.pacmanRow = np.where(advance, newRow, self.pacmanRow)
+        self.pacmanCol = np.where(advance, newCol, self.pacmanCol)
+        self.collectFruit(moving)
+        self.collectPellet(moving)
+
+        # Lanes with no pellets left are done; the others check for collisions
+        checking = moving & (self.pelletCount != 0)
+        caught = checking & ~self.safetyCheck(checking)
+        safe &= ~caught
+
+        # Increment the number of ticks by the chosen amount
+        self.currTicks[checking & ~caught] += numTicks
+
+        self.alive &= safe
+        return safe, self.currScore - startScore
+
+    def rollout(self, actions, numTicks: int):
+        """
+        Play a sequence of actions in every lane, stopping lanes when Pacman is caught.
+
+        @param:
+            - actions, np.ndarray: (N, depth) Pacman directions for each lane and step
+            - numTicks, int: number of ticks per step
+        @return:
+            - np.ndarray: (N,) bool, whether each lane survived the whole sequence
+            - np.ndarray: (N,) int, the total score gained in each lane
+            - np.ndarray: (N,) int, the number of steps survived in each lane
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        startScore = self.currScore.copy()
+        survived = np.zeros(self.numLanes, dtype=np.int64)
+        for step in range(actions.shape[1]):
+            wasAlive = self.alive.copy()
+            self.simulateAction(numTicks, actions[:, step])
+            survived += wasAlive & self.alive
+        return self.alive.copy(), self.currScore - startScore, survived
+
+    def toGameState(self, lane: int) -> GameState:
+        """
+        Build a GameState holding the current state of one lane (for inspection or validation).
+        """
+        g = self.states[lane].clone()
+        g.currTicks = int(self.currTicks[lane])
+        g.gameMode = GameModes(int(self.gameMode[lane]))
+        g.modeSteps = int(self.modeSteps[lane])
+        g.modeDuration = int(self.modeDuration[lane])
+        g.currScore = int(self.currScore[lane])
+
+        g.pacmanLoc.row, g.pacmanLoc.col = int(self.pacmanRow[lane]), int(self.pacmanCol[lane])
+        g.pacmanLoc.rowDir, g.pacmanLoc.colDir = int(self.pacmanRowDir[lane]), int(self.pacmanColDir[lane])
+        for i, ghost in enumerate(g.ghosts):
+            ghost.location.row, ghost.location.col = int(self.ghostRow[lane, i]), int(self.ghostCol[lane, i])
+            ghost.location.rowDir = int(self.ghostRowDir[lane, i])
+            ghost.location.colDir = int(self.ghostColDir[lane, i])
+            ghost.frightSteps = int(self.frightSteps[lane, i])
+            ghost.spawning = bool(self.spawning[lane, i])
+            ghost.plannedDirection = Directions(int(self.plannedDirection[lane, i]))
+
+        g.fruitLoc.row, g.fruitLoc.col = int(self.fruitRow[lane]), int(self.fruitCol[lane])
+        g.fruitSteps = int(self.fruitSteps[lane])
+        g.setPellets(self.pelletArr[lane].tolist())
+        return g
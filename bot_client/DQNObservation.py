@@ -0,0 +1,206 @@
+from array import array
+
+import numpy as np
+
+from gameState import GameState, GameModes
+from MazeIndex import getMazeIndex
+
+# Observation constants (from pacbot_rs_2/variables.rs and game_modes.rs)
+OBS_CHANNELS = 17
+GHOST_FRIGHT_STEPS = 40
+COMBO_MULTIPLIER = 200
+PELLET_POINTS = 10
+SUPER_PELLET_POINTS = 50
+FRUIT_POINTS = 100
+CHASE_DURATION = 180  # GameMode::CHASE.duration()
+
+SUPER_PELLET_ROWS = frozenset({3, 23})
+SUPER_PELLET_COLS = frozenset({1, 26})
+
+
+def buildObservation(g: GameState, lastGhostPos: list[tuple[int, int]]) -> np.ndarray:
+    """
+    Build the DQN observation of a state from scratch, cell by cell (reference for
+    DQNObservation). The format is the 17-channel (channels, col, obs_row) one used
+    during training, where obs_row = 30 - row (y-flipped from game coordinates).
+    @param:
+        - g, GameState: the state to observe
+        - lastGhostPos, list[tuple[int, int]]: the ghost positions of the previous step
+    @return:
+        - np.ndarray, the (17, 28, 31) float32 observation
+    """
+    maze = getMazeIndex(tuple(g.wallArr))
+    obs = np.zeros((OBS_CHANNELS, 28, 31), dtype=np.float32)
+
+    # Channel 0 (walls): the wall grid, transposed and y-flipped
+    obs[0] = maze.walls.T[:, ::-1]
+
+    # Channel 1 (rewards): only walkable tiles can hold pellets or fruit
+    for row, col in maze.tiles:
+        obs_row = 30 - row
+        if g.pelletAt(row, col):
+            is_super = row in SUPER_PELLET_ROWS and col in SUPER_PELLET_COLS
+            pts = SUPER_PELLET_POINTS if is_super else PELLET_POINTS
+            obs[1, col, obs_row] = pts / COMBO_MULTIPLIER
+        elif g.fruitSteps > 0 and g.fruitLoc.row == row and g.fruitLoc.col == col:
+            obs[1, col, obs_row] = FRUIT_POINTS / COMBO_MULTIPLIER
+
+    # Channels 2-3: Pacman (last pos reused as current; no tracking overhead)
+    pr, pc = g.pacmanLoc.row, g.pacmanLoc.col
+    if 0 <= pr < 31 and 0 <= pc < 28:
+        obs[2, pc, 30 - pr] = 1.0
+        obs[3, pc, 30 - pr] = 1.0
+
+    # Channels 4-7: ghost current positions
+    # Channels 8-11: ghost last positions (from previous step)
+    # Channels 12-14: mode state at ghost location
+    for i, ghost in enumerate(g.ghosts):
+        gr, gc = ghost.location.row, ghost.location.col
+        if 0 <= gr < 31 and 0 <= gc < 28:
+            gobs = 30 - gr
+            obs[4 + i, gc, gobs] = 1.0
+            if ghost.isFrightened():
+                obs[14, gc, gobs] = ghost.frightSteps / GHOST_FRIGHT_STEPS
+            else:
+                progress = g.modeSteps / CHASE_DURATION
+                ch = 13 if g.gameMode == GameModes.CHASE else 12
+                obs[ch, gc, gobs] = progress
+
+        lgr, lgc = lastGhostPos[i]
+        if 0 <= lgr < 31 and 0 <= lgc < 28:
+            obs[8 + i, lgc, 30 - lgr] = 1.0
+
+    # Channel 15: ticks_per_step / update_period (1.0 approximation)
+    obs[15, :, :] = 1.0
+
+    # Channel 16: super pellet locations
+    for row in SUPER_PELLET_ROWS:
+        for col in SUPER_PELLET_COLS:
+            if g.pelletAt(row, col):
+                obs[16, col, 30 - row] = 1.0
+
+    return obs
+
+
+def observationKey(g: GameState, lastGhostPos: list[tuple[int, int]]) -> tuple:
+    """
+    Fingerprint of everything the observation of a state depends on (pellets,
+    fruit, entity positions, mode, fright steps and the last ghost positions):
+    states with equal keys have identical observations, so per-state results
+    can be cached by key.
+    """
+    fruit = (g.fruitLoc.row, g.fruitLoc.col) if g.fruitSteps > 0 else None
+    ghosts = tuple((ghost.location.row, ghost.location.col, ghost.frightSteps) for ghost in g.ghosts)
+    return (g.pelletArr.tobytes(), fruit, g.pacmanLoc.row, g.pacmanLoc.col, ghosts,
+            g.gameMode, g.modeSteps, tuple(lastGhostPos))
+
+
+class DQNObservation:
+    def __init__(self, walls: tuple[int, ...]):
+        """
+        Incremental builder of the DQN observation (same values as buildObservation),
+        reusing one buffer across frames: the static channels are filled once, the
+        reward channels are only rebuilt (vectorized, from the pellet bitsets) when
+        the pellets or the fruit change, and the entity channels are only cleared
+        at the cells set for the previous frame.
+
+        @param:
+            - walls, tuple[int, ...]: one bitset per row, as in GameState.wallArr
+        """
+        maze = getMazeIndex(walls)
+        self.obs = np.zeros((OBS_CHANNELS, 28, 31), dtype=np.float32)
+
+        # Static channels: walls, and ticks_per_step / update_period
+        self.obs[0] = maze.walls.T[:, ::-1]
+        self.obs[15] = 1.0
+
+        # Observation cell, pellet row and column of every tile
+        self._tileCols = maze.cols.astype(np.intp)
+        self._tileObsRows = 30 - maze.rows.astype(np.intp)
+        self._tileRows = maze.rows.astype(np.intp)
+        self._tileShifts = maze.cols.astype(np.int64)
+        self._tileIds = maze.tile_to_id
+
+        # Reward of a pellet on every tile (super pellets on the four corners)
+        superTile = np.isin(maze.rows, list(SUPER_PELLET_ROWS)) & np.isin(maze.cols, list(SUPER_PELLET_COLS))
+        self._pelletValues = np.where(superTile, np.float32(SUPER_PELLET_POINTS / COMBO_MULTIPLIER),
+                                      np.float32(PELLET_POINTS / COMBO_MULTIPLIER)).astype(np.float32)
+        self._superTiles = [(row, col) for row in SUPER_PELLET_ROWS for col in SUPER_PELLET_COLS]
+
+        # Pellets and fruit the reward channels were built for
+        self._pellets: array | None = None
+        self._fruitTile = -1
+
+        # (channel, col, obs_row) cells set in the entity channels for the previous frame
+        self._entityCells: list[tuple[int, int, int]] = []
+
+    def _updateRewards(self, g: GameState) -> None:
+        """
+        Rebuild the reward channel (1) and the super pellet channel (16), if needed.
+        """
+        fruitTile = -1
+        if g.fruitSteps > 0:
+            fruitTile = self._tileIds.get((g.fruitLoc.row, g.fruitLoc.col), -1)
+        if self._pellets == g.pelletArr and fruitTile == self._fruitTile:
+            return
+        self._pellets = array('I', g.pelletArr)
+        self._fruitTile = fruitTile
+
+        # Unpack the pellet bit of every tile
+        pelletRows = np.asarray(g.pelletArr, dtype=np.int64)[self._tileRows]
+        hasPellet = ((pelletRows >> self._tileShifts) & 1).astype(bool)
+        rewards = np.where(hasPellet, self._pelletValues, np.float32(0))
+        if fruitTile >= 0 and not hasPellet[fruitTile]:
+            rewards[fruitTile] = FRUIT_POINTS / COMBO_MULTIPLIER
+        self.obs[1, self._tileCols, self._tileObsRows] = rewards
+
+        for row, col in self._superTiles:
+            self.obs[16, col, 30 - row] = hasPellet[self._tileIds[(row, col)]]
+
+    def build(self, g: GameState, lastGhostPos: list[tuple[int, int]]) -> np.ndarray:
+        """
+        Update the observation for a state.
+        @param:
+            - g, GameState: the state to observe
+            - lastGhostPos, list[tuple[int, int]]: the ghost positions of the previous step
+        @return:
+            - np.ndarray, the (17, 28, 31) float32 observation (the builder's own
+              buffer, overwritten by the next call)
+        """
+        obs = self.obs
+        self._updateRewards(g)
+
+        # Clear the entity cells of the previous frame
+        for cell in self._entityCells:
+            obs[cell] = 0.0
+        cells = self._entityCells = []
+
+        # Channels 2-3: Pacman (last pos reused as current)
+        pr, pc = g.pacmanLoc.row, g.pacmanLoc.col
+        if 0 <= pr < 31 and 0 <= pc < 28:
+            cells.append((2, pc, 30 - pr))
+            cells.append((3, pc, 30 - pr))
+            obs[2, pc, 30 - pr] = 1.0
+            obs[3, pc, 30 - pr] = 1.0
+
+        # Channels 4-7: ghost positions, 8-11: ghost last positions, 12-14: mode state
+        for i, ghost in enumerate(g.ghosts):
+            gr, gc = ghost.location.row, ghost.location.col
+            if 0 <= gr < 31 and 0 <= gc < 28:
+                gobs = 30 - gr
+                cells.append((4 + i, gc, gobs))
+                obs[4 + i, gc, gobs] = 1.0
+                if ghost.isFrightened():
+                    cells.append((14, gc, gobs))
+                    obs[14, gc, gobs] = ghost.frightSteps / GHOST_FRIGHT_STEPS
+                else:
+                    ch = 13 if g.gameMode == GameModes.CHASE else 12
+                    cells.append((ch, gc, gobs))
+                    obs[ch, gc, gobs] = g.modeSteps / CHASE_DURATION
+
+            lgr, lgc = lastGhostPos[i]
+            if 0 <= lgr < 31 and 0 <= lgc < 28:
+                cells.append((8 + i, lgc, 30 - lgr))
+                obs[8 + i, lgc, 30 - lgr] = 1.0
+
+        return obs
@@ -1,105 +1,221 @@
+import os
+from collections import deque
+from time import perf_counter
 
-import json
-from json import JSONEncoder
 import numpy as np
 
-from utils import get_astar_dist, get_walkable_tiles
+from gameState import Directions
+from MazeIndex import NEIGHBOR_DIRECTIONS, getMazeIndex
 
+# On-disk location of the precomputed distance and next-hop tables
+DIST_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'distTable.npy')
+NEXT_HOP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'nextHop.npy')
+WALL_HASH_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'wallHash.txt')
 
-class NumpyArrayEncoder(JSONEncoder):
+# Distances in the 31x28 maze never exceed 255, so one byte per pair is enough
+DIST_DTYPE = np.uint8
+UNREACHABLE = np.iinfo(DIST_DTYPE).max
+
+
+def createDistTableDict(g):
     """
-    Encode numpy arrays to JSON
+    Create a dictionary of {tile tuples: indices} for the distance table.
+    Indices are the dense MazeIndex tile ids, so the mapping only depends on the walls.
+    @param:
+        - g, GameState object
+    @return:
+        - dict, the distance table dictionary
     """
-    def default(self, obj):
-        if isinstance(obj, np.ndarray):
-            return obj.tolist()
-        return JSONEncoder.default(self, obj)
+    return getMazeIndex(tuple(g.wallArr)).tile_to_id
 
 
-def createDistTable(g):
+def createDistTable(g, path: str = DIST_TABLE_PATH):
     """
-    Creates a table of distances between all walkable tiles in the game.
-    Includes ghost spawn tiles.
-    @param: 
+    Creates a table of maze distances between all walkable tiles in the game,
+    running one breadth-first search per source tile, and saves it as a .npy file.
+    Rows and columns are MazeIndex tile ids.
+    @param:
         - g, GameState object
-    @return: 
-        - json representation of np.ndarray
+        - path, str: where to write the table
+    @return:
+        - np.ndarray, the (num_tiles, num_tiles) distance table
+    """
+    maze = getMazeIndex(tuple(g.wallArr))
+    neighbors = [[n for n in row if n >= 0] for row in maze.neighbors.tolist()]
+    distTable = np.full((maze.num_tiles, maze.num_tiles), UNREACHABLE, dtype=DIST_DTYPE)
+
+    # Create distance matrix, one BFS per source tile
+    for src in range(maze.num_tiles):
+        dist = [UNREACHABLE] * maze.num_tiles
+        dist[src] = 0
+        frontier = deque([src])
+        while frontier:
+            node = frontier.popleft()
+            for neighbor in neighbors[node]:
+                if dist[neighbor] == UNREACHABLE:
+                    dist[neighbor] = dist[node] + 1
+                    frontier.append(neighbor)
+        distTable[src] = dist
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.save(path, distTable)
+    return distTable
+
+
+def loadDistTable(path: str = DIST_TABLE_PATH):
+    """
+    Load the distance table from the .npy file (memory mapped, read-only).
+    @return: np.ndarray, the distance table
     """
-    walkable_tiles = get_walkable_tiles(g)
-    distTable = np.zeros((len(walkable_tiles), len(walkable_tiles)))
+    return np.load(path, mmap_mode='r')
+
 
-    ghost_spawn_tiles = set()
-    for i in range(13, 16):
-            for j in range(11, 17):
-                ghost_spawn_tiles.add((i, j))
-    
-    my_tiles = walkable_tiles.union(ghost_spawn_tiles)
+def createNextHopTable(g, distTable, path: str = NEXT_HOP_PATH):
+    """
+    Creates a table holding, for every (source, target) pair of tiles, the first
+    direction to move in along a shortest path, and saves it as a .npy file.
+    Ties are broken in NEIGHBOR_DIRECTIONS order (up, left, down, right).
+    @param:
+        - g, GameState object
+        - distTable, np.ndarray: the distance table from createDistTable
+        - path, str: where to write the table
+    @return:
+        - np.ndarray, the (num_tiles, num_tiles) table of Directions values
+    """
+    maze = getMazeIndex(tuple(g.wallArr))
+    dist = np.asarray(distTable, dtype=np.int16)
+    nextHop = np.full(dist.shape, Directions.NONE, dtype=np.uint8)
 
-    # Create distance matrix
-    for tile1 in my_tiles:
-        for tile2 in my_tiles:
-            dist = get_astar_dist(tile1, tile2, g)
-            distTable[tile1, tile2] = dist
+    for k, direction in enumerate(NEIGHBOR_DIRECTIONS):
+        # Id of the neighbor in this direction for every tile (or -1 for a wall)
+        neighbor = maze.neighbors[:, k]
+        srcs = np.flatnonzero(neighbor >= 0)
 
-    # Write to json file
-    json_distTable = {"distTable": distTable}
-    with open('static/distTable.json', 'w') as f:
-        json.dump(json_distTable, f, cls=NumpyArrayEncoder)
+        # Moving to the neighbor is on a shortest path if it is one step closer
+        closer = dist[neighbor[srcs]] + 1 == dist[srcs]
+        unset = nextHop[srcs] == Directions.NONE
+        nextHop[srcs] = np.where(closer & unset, direction, nextHop[srcs])
 
-    print("done")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.save(path, nextHop)
+    return nextHop
 
 
-def loadDistTable():
+def loadNextHopTable(path: str = NEXT_HOP_PATH):
     """
-    Load the distance table from the JSON file.
-    @return: np.ndarray, the distance table
+    Load the next-hop table from the .npy file (memory mapped, read-only).
+    @return: np.ndarray, the next-hop table
     """
-    with open('static/distTable.json', 'r') as f:
-        data = json.load(f)
-    return data["distTable"]
+    return np.load(path, mmap_mode='r')
 
 
-def createDistTableDict(g):
-    """"
-    Create a dictionary of {tile tuples: indices} for the distance table.
-    @param: 
+def saveWallHash(g, path: str = WALL_HASH_PATH):
+    """
+    Save the fingerprint of the maze walls the tables were built for.
+    @param:
         - g, GameState object
-    @return:
-        - json representation of dict
+        - path, str: where to write the fingerprint
     """
-    # Get ghost spawn tiles
-    ghost_spawn_tiles = set()
-    for i in range(13, 16):
-            for j in range(11, 17):
-                ghost_spawn_tiles.add((i, j))
-
-    # All walkable tiles
-    my_tiles = get_walkable_tiles(g).union(ghost_spawn_tiles)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(getMazeIndex(tuple(g.wallArr)).wall_hash + '\n')
 
-    # Create dictionary
-    dtDict = {}
-    for idx, tile in enumerate(my_tiles):
-        tuple_str = ','.join(map(str, tile))
-        dtDict[tuple_str] = idx
 
-    with open('static/dtDict.json', 'w') as f:
-        json.dump(dtDict, f)
+def loadWallHash(path: str = WALL_HASH_PATH):
+    """
+    Load the fingerprint of the maze walls the tables were built for.
+    @return: str, the fingerprint (None if there is none)
+    """
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return f.read().strip()
 
 
-def loadDistTableDict():
+def loadDistTableDict(g):
     """
-    Load the distance table dictionary from the JSON file.
-    @return: 
+    Load the distance table dictionary.
+    @param:
+        - g, GameState object
+    @return:
         - dict, the distance table dictionary
     """
-    with open('static/dtDict.json', 'r') as f:
-        data = json.load(f)
-
-        # Convert string keys back to tuples
-        converted_data = {}
-        for key, value in data.items():
-            # Split the string key by comma and convert elements to integers
-            key_tuple = tuple(map(int, key.split(',')))
-            converted_data[key_tuple] = value
-    
-    return converted_data
\ No newline at end of file
+    return createDistTableDict(g)
+
+
+class RoutingTable:
+    def __init__(self, g):
+        """
+        Precomputed shortest-path routing between all walkable tiles, so that pure
+        maze-distance queries are answered with table lookups instead of a search.
+        The tables are loaded from disk, and rebuilt if missing or built for different walls.
+
+        @param:
+            - g, GameState object
+        """
+        self.maze = getMazeIndex(tuple(g.wallArr))
+
+        if (loadWallHash(WALL_HASH_PATH) == self.maze.wall_hash
+                and os.path.isfile(DIST_TABLE_PATH) and os.path.isfile(NEXT_HOP_PATH)):
+            # Plain ndarray views of the memory maps index several times faster
+            self.distTable = np.asarray(loadDistTable(DIST_TABLE_PATH))
+            self.nextHop = np.asarray(loadNextHopTable(NEXT_HOP_PATH))
+        else: # missing, or stale tables from a different maze
+            self.distTable = createDistTable(g, DIST_TABLE_PATH)
+            self.nextHop = createNextHopTable(g, self.distTable, NEXT_HOP_PATH)
+            saveWallHash(g, WALL_HASH_PATH)
+
+    def distance(self, src, dst):
+        """
+        Get the maze distance between two tiles.
+        @param:
+            - src, dst: tuples, (row, col) of the two tiles
+        @return:
+            - int, the number of moves from src to dst (UNREACHABLE if there is no path)
+        """
+        return int(self.distTable[self.maze.tile_to_id[src], self.maze.tile_to_id[dst]])
+
+    def next_step(self, src, dst):
+        """
+        Get the first move along a shortest path between two tiles.
+        @param:
+            - src, dst: tuples, (row, col) of the two tiles
+        @return:
+            - Directions, the direction to move in (NONE if src == dst or unreachable)
+        """
+        return Directions(self.nextHop[self.maze.tile_to_id[src], self.maze.tile_to_id[dst]])
+
+    def path(self, src, dst):
+        """
+        Get a shortest path between two tiles, walking the next-hop table.
+        @param:
+            - src, dst: tuples, (row, col) of the two tiles
+        @return:
+            - list, the tiles from src (exclusive) to dst (inclusive), like find_path
+        """
+        curr = self.maze.tile_to_id[src]
+        target = self.maze.tile_to_id[dst]
+        path = []
+        while curr != target:
+            direction = int(self.nextHop[curr, target])
+            if direction == Directions.NONE:
+                return []
+            # Directions values double as NEIGHBOR_DIRECTIONS column indices
+            curr = int(self.maze.neighbors[curr, direction])
+            path.append(self.maze.tiles[curr])
+        return path
+
+
+if __name__ == '__main__':
+    # Rebuild the tables after editing the maze: python DistMatrix.py
+    from gameState import GameState
+
+    start = perf_counter()
+    table = createDistTable(GameState())
+    print(f'Built {table.shape} distance table in {perf_counter() - start:.3f} s -> {DIST_TABLE_PATH}')
+
+    start = perf_counter()
+    createNextHopTable(GameState(), table)
+    print(f'Built {table.shape} next-hop table in {perf_counter() - start:.3f} s -> {NEXT_HOP_PATH}')
+
+    saveWallHash(GameState())
@@ -0,0 +1,108 @@
+import bisect
+import statistics
+from collections import deque
+from contextlib import nullcontext
+from time import perf_counter
+
+# Upper edges of the histogram buckets, in seconds (the last bucket is unbounded)
+HISTOGRAM_EDGES = (1e-4, 2e-4, 5e-4, 1e-3, 2e-3, 5e-3, 1e-2, 2e-2, 5e-2, 0.1, 0.2, 0.5)
+
+# Samples kept per latency: the most recent ones (a few minutes of decisions)
+MAX_SAMPLES = 10000
+
+# Span returned while timing is disabled
+_NO_SPAN = nullcontext()
+
+
+class _Span:
+    """
+    Context manager adding the time spent in its block to a buffer of samples.
+    """
+    __slots__ = ('samples', 'start')
+
+    def __init__(self, samples: deque[float]):
+        self.samples = samples
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.start = perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        self.samples.append(perf_counter() - self.start)
+
+
+class LatencyStats:
+    def __init__(self):
+        """
+        Latency samples of the client, in seconds, by name: 'frame_to_command' (from
+        a server frame arriving to the command decided from it being issued), and
+        the stages of the decision modules, timed with span(). Only the last
+        MAX_SAMPLES samples of each are kept, and none while timing is disabled.
+        """
+        self.enabled = True
+        self.samples: dict[str, deque[float]] = {}
+        self._spans: dict[str, _Span] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        """
+        Add a latency sample.
+        """
+        if self.enabled:
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=MAX_SAMPLES)
+            samples.append(seconds)
+
+    def span(self, name: str):
+        """
+        Time a block of code: `with latencyStats.span('find_path'): ...`.
+        Spans of the same name must not be nested.
+        @return:
+            - a context manager, that does nothing while timing is disabled
+        """
+        if not self.enabled:
+            return _NO_SPAN
+        span = self._spans.get(name)
+        if span is None:
+            span = self._spans[name] = _Span(self.samples.setdefault(name, deque(maxlen=MAX_SAMPLES)))
+        return span
+
+    def summary(self) -> str:
+        """
+        One line per latency: count, mean, jitter (standard deviation) and percentiles, in ms.
+        """
+        lines = []
+        for name, samples in self.samples.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            percentile = lambda p: ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1e3
+            jitter = statistics.pstdev(ordered) * 1e3
+            lines.append(f'{name:<20} n={len(ordered):<6} mean={statistics.fmean(ordered) * 1e3:7.2f} ms  '
+                         f'jitter={jitter:7.2f} ms  p50={percentile(0.5):7.2f}  p95={percentile(0.95):7.2f}  '
+                         f'p99={percentile(0.99):7.2f}  max={ordered[-1] * 1e3:7.2f} ms')
+        return '\n'.join(lines)
+
+    def histograms(self) -> str:
+        """
+        The summary, followed by the number of samples of each latency per bucket
+        of HISTOGRAM_EDGES.
+        """
+        lines = [self.summary()]
+        for name, samples in self.samples.items():
+            if not samples:
+                continue
+            counts = [0] * (len(HISTOGRAM_EDGES) + 1)
+            for seconds in samples:
+                counts[bisect.bisect_left(HISTOGRAM_EDGES, seconds)] += 1
+            lines.append(f'\n{name}:')
+            lower = 0.0
+            for upper, count in zip((*HISTOGRAM_EDGES, float('inf')), counts):
+                if count:
+                    lines.append(f'  {lower * 1e3:7.1f} - {upper * 1e3:7.1f} ms: {count:7d} {"#" * round(40 * count / len(samples))}')
+                lower = upper
+        return '\n'.join(lines)
+
+
+# Shared recorder for the client and the decision modules
+latencyStats = LatencyStats()
@@ -0,0 +1,103 @@
+import hashlib
+from collections import deque
+from functools import lru_cache
+
+import numpy as np
+
+from gameState import Directions, D_ROW, D_COL
+from walls import wallArr
+
+# Maze dimensions (rows, columns)
+HEIGHT = 31
+WIDTH = 28
+
+# Directions in neighbor-array column order
+NEIGHBOR_DIRECTIONS = (Directions.UP, Directions.LEFT, Directions.DOWN, Directions.RIGHT)
+
+# Ghost house, as in the server (ghostSpawnAt and ghostHouseExitRow/Col): spawning ghosts
+# move within the box and leave through the exit, all of which are walls to Pacman
+GHOST_HOUSE_ROWS = range(13, 15)
+GHOST_HOUSE_COLS = range(11, 16)
+GHOST_HOUSE_EXIT = (12, 13)
+
+
+class MazeIndex:
+    def __init__(self, walls: list[int] = wallArr):
+        """
+        Dense integer indexing of the walkable tiles of the maze, so that per-tile data
+        can live in flat numpy arrays instead of dicts keyed by (row, col) tuples.
+        Tiles are numbered in row-major order.
+
+        @param:
+            - walls, list[int]: one bitset per row, as in walls.wallArr
+        """
+        # Wall grid, True where there is a wall
+        self.walls = np.array([[bool((walls[row] >> col) & 1) for col in range(WIDTH)] for row in range(HEIGHT)])
+
+        # Fingerprint of the wall grid, to tell whether tables saved to disk belong to this maze
+        self.wall_hash = hashlib.sha1(np.packbits(self.walls).tobytes()).hexdigest()
+
+        # Row and column of every tile id
+        self.rows, self.cols = (a.astype(np.int16) for a in np.nonzero(~self.walls))
+        self.num_tiles = len(self.rows)
+
+        # Tile id of every cell in the grid (-1 for walls)
+        self.id_grid = np.full((HEIGHT, WIDTH), -1, dtype=np.int16)
+        self.id_grid[self.rows, self.cols] = np.arange(self.num_tiles)
+
+        # Python-side lookups, for O(1) conversions without numpy scalar overhead
+        self.tiles: list[tuple[int, int]] = list(zip(self.rows.tolist(), self.cols.tolist()))
+        self.tile_to_id: dict[tuple[int, int], int] = {tile: idx for idx, tile in enumerate(self.tiles)}
+
+        # Neighbor ids of every tile in NEIGHBOR_DIRECTIONS order, padded with -1 for walls
+        self.neighbors = np.full((self.num_tiles, len(NEIGHBOR_DIRECTIONS)), -1, dtype=np.int16)
+        for k, direction in enumerate(NEIGHBOR_DIRECTIONS):
+            nrows = self.rows + D_ROW[direction]
+            ncols = self.cols + D_COL[direction]
+            inside = (nrows >= 0) & (nrows < HEIGHT) & (ncols >= 0) & (ncols < WIDTH)
+            self.neighbors[inside, k] = self.id_grid[nrows[inside], ncols[inside]]
+
+        # Walkable tile just outside the ghost house exit (-1 if there is none), and the
+        # number of moves from every ghost house cell to it, by BFS within the house
+        house = {(row, col) for row in GHOST_HOUSE_ROWS for col in GHOST_HOUSE_COLS} | {GHOST_HOUSE_EXIT}
+        exit_row, exit_col = GHOST_HOUSE_EXIT
+        doors = [self.id_of(exit_row + D_ROW[direction], exit_col + D_COL[direction]) for direction in NEIGHBOR_DIRECTIONS]
+        self.house_door: int = max(doors)
+        self.house_steps: dict[tuple[int, int], int] = {}
+        if self.house_door >= 0:
+            self.house_steps[GHOST_HOUSE_EXIT] = 1
+            frontier = deque([GHOST_HOUSE_EXIT])
+            while frontier:
+                row, col = frontier.popleft()
+                for direction in NEIGHBOR_DIRECTIONS:
+                    cell = (row + D_ROW[direction], col + D_COL[direction])
+                    if cell in house and cell not in self.house_steps:
+                        self.house_steps[cell] = self.house_steps[(row, col)] + 1
+                        frontier.append(cell)
+
+    def id_of(self, row: int, col: int) -> int:
+        """
+        Get the id of a tile.
+        @return:
+            - int, the tile id, or -1 if the tile is a wall or off the grid
+        """
+        return self.tile_to_id.get((row, col), -1)
+
+    def tile_of(self, idx: int) -> tuple[int, int]:
+        """
+        Get the (row, col) of a tile id.
+        """
+        return self.tiles[idx]
+
+    def __len__(self) -> int:
+        return self.num_tiles
+
+
+@lru_cache(maxsize=None)
+def getMazeIndex(walls: tuple[int, ...] = tuple(wallArr)) -> MazeIndex:
+    """
+    Get the shared MazeIndex for a maze (built once per wall layout).
+    @param:
+        - walls, tuple[int, ...]: one bitset per row, defaults to the competition maze
+    """
+    return MazeIndex(list(walls))
@@ -0,0 +1,174 @@
+import multiprocessing
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor, wait
+from time import perf_counter, time
+
+from gameState import GameState, GhostColors, Directions
+from DistMatrix import RoutingTable
+from mcts_module import rollout, TICKS_PER_MOVE, DEATH_PENALTY, DISCOUNT, GATHER_GRACE
+
+# pacbotClient parses its arguments at import time, so workers are forked rather
+# than started by re-importing the main module (spawn / forkserver). The pool must
+# be created before the client opens the robot socket and starts its event loop
+# (see pacbotClient.py), so that the workers inherit neither
+_CONTEXT = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+
+# Per-process worker data, built once by _initWorker
+_workerState: GameState
+_workerRoutes: RoutingTable
+_workerRng: random.Random
+
+
+def _initWorker() -> None:
+    '''
+    Set up a worker process: a scratch game state to decode into, and the routing tables
+    '''
+    global _workerState, _workerRoutes, _workerRng
+
+    # Close the robot socket, in case it was open when the worker was forked: only
+    # the client process may send directions
+    low_level = sys.modules.get('low_level')
+    if low_level is not None:
+        low_level.s.close()
+        low_level.connected = False
+
+    _workerState = GameState()
+    _workerRoutes = RoutingTable(_workerState)
+    _workerRng = random.Random()
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _evaluateMoves(message: bytes, plans: tuple[int, ...], moves: tuple[int, ...],
+                   depth: int, deadline: float) -> dict[int, tuple[float, int, int]]:
+    '''
+    Worker task: decode a state, then run rollouts after each candidate first move
+    in turn until the deadline (at least one each)
+    @return:
+        - dict, {move: (sum of discounted returns, number of rollouts, moves simulated)}
+    '''
+    # Deadline on this process' perf_counter() clock, for the rollouts to stop at
+    stop = perf_counter() + (deadline - time())
+
+    g = _workerState
+    g.update(message, lockOverride=True)
+    for ghost, plan in zip(g.ghosts, plans):
+        ghost.plannedDirection = Directions(plan)
+
+    # State after each first move, and the points it gains
+    children = {}
+    results = {}
+    for move in moves:
+        child = g.clone()
+        score = child.currScore
+        if child.simulateAction(TICKS_PER_MOVE, Directions(move)):
+            children[move] = (child, child.currScore - score)
+        else: # caught right away, no need for rollouts
+            results[move] = (child.currScore - score - DEATH_PENALTY, 1, 1)
+
+    # Round-robin over the moves, so that they all get rollouts when time runs out
+    totals = {move: [0.0, 0, 1] for move in children}
+    timeUp = not children
+    while not timeUp:
+        for move, (child, reward) in children.items():
+            value, steps = rollout(child, depth, _workerRoutes, _workerRng, stop)
+            total = totals[move]
+            total[0] += reward + DISCOUNT * value
+            total[1] += 1
+            total[2] += steps
+
+            # Stop once every move has had its first rollout
+            if time() >= deadline and total[1] > 1:
+                timeUp = True
+                break
+        else:
+            timeUp = time() >= deadline
+
+    results.update((move, tuple(total)) for move, total in totals.items())
+    return results
+
+
+class RolloutPool:
+    def __init__(self, workers: int | None = None, rollout_depth: int = 10):
+        """
+        Pool of worker processes running rollouts for the search strategies, so that
+        they use the idle cores. Workers are started (and warmed up) once, and kept
+        across decisions; states are sent in the server's serialized format.
+
+        @param:
+            - workers, int: number of worker processes (defaults to all cores but one)
+            - rollout_depth, int: moves per rollout
+        """
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.rollout_depth = rollout_depth
+        self.executor = ProcessPoolExecutor(self.workers, mp_context=_CONTEXT, initializer=_initWorker)
+        self.stats = {'batches': 0, 'tasks': 0, 'dropped': 0, 'rollouts': 0, 'steps': 0}
+        self.warm()
+
+    def warm(self) -> set[int]:
+        """
+        Start every worker process now, so that no decision pays for it.
+        @return:
+            - set[int], the worker process ids
+        """
+        return {future.result() for future in [self.executor.submit(_ping) for _ in range(self.workers)]}
+
+    def submit(self, g: GameState, moves: list[Directions], deadline: float) -> list:
+        """
+        Start evaluating the candidate first moves of a state on every worker.
+        @param:
+            - g, GameState: the state to search from (serialized, so it can keep changing)
+            - moves, list[Directions]: the candidate first moves
+            - deadline, float: time.time() at which the workers stop
+        @return:
+            - list, the pending futures, for gather()
+        """
+        message = g.serialize()
+        plans = g.getGhostPlans()
+        plans = tuple(int(plans[color]) for color in GhostColors)
+        moves = tuple(int(move) for move in moves)
+        self.stats['batches'] += 1
+        self.stats['tasks'] += self.workers
+        return [self.executor.submit(_evaluateMoves, message, plans, moves, self.rollout_depth, deadline)
+                for _ in range(self.workers)]
+
+    def gather(self, futures: list, deadline: float) -> dict[Directions, tuple[float, int]]:
+        """
+        Collect the results that are ready by the deadline, dropping the stragglers.
+        @return:
+            - dict, {move: (sum of discounted returns, number of rollouts)}
+        """
+        done, pending = wait(futures, timeout=max(0.0, deadline + GATHER_GRACE - time()))
+        for future in pending:
+            future.cancel()
+        self.stats['dropped'] += len(pending)
+
+        results: dict[Directions, tuple[float, int]] = {}
+        for future in done:
+            if future.cancelled() or future.exception() is not None:
+                self.stats['dropped'] += 1
+                continue
+            for move, (total, count, steps) in future.result().items():
+                prevTotal, prevCount = results.get(Directions(move), (0.0, 0))
+                results[Directions(move)] = (prevTotal + total, prevCount + count)
+                self.stats['rollouts'] += count
+                self.stats['steps'] += steps
+        return results
+
+    def evaluate(self, g: GameState, moves: list[Directions], budget: float) -> dict[Directions, tuple[float, int]]:
+        """
+        Evaluate the candidate first moves of a state for at most budget seconds.
+        """
+        deadline = time() + budget
+        return self.gather(self.submit(g, moves, deadline), deadline)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop the workers, cancelling the pending tasks. Waiting for them to exit
+        avoids racing the interpreter's own shutdown of the pool.
+        """
+        self.executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,629 @@
+'''
+Microbenchmarks for the hot paths of the bot client.
+
+Usage: python benchmarks.py <benchmark> [--iters N] [--seed S]
+'''
+
+import argparse
+import random
+import tracemalloc
+from contextlib import contextmanager
+from time import perf_counter, process_time
+
+import numpy as np
+
+from gameState import GameState, GameModes, GhostColors, Directions, Location, Ghost
+from gameState import compressGameState, decompressGameState
+from serverMessage import ServerMessage
+from pellets import initPelletArr
+from sampleStates import random_state, random_walk
+
+
+def timed(label: str, fn, states: list, iters: int) -> float:
+    '''
+    Run fn over every state, iters times, and print the mean time per call
+    '''
+    start = perf_counter()
+    for _ in range(iters):
+        for state in states:
+            fn(state)
+    elapsed = (perf_counter() - start) / (iters * len(states))
+    print(f'{label:<40} {elapsed * 1e6:10.1f} us/call')
+    return elapsed
+
+
+def bench_avoidance(states: list, iters: int) -> None:
+    '''
+    cellAvoidanceMap: per-tile reference implementation vs vectorized updateMap
+    '''
+    from AvoidanceMap import cellAvoidanceMap
+
+    avoidance = cellAvoidanceMap(states[0])
+    before = timed('updateMapPerTile (per-tile loop)', avoidance.updateMapPerTile, states, iters)
+    after = timed('updateMap (vectorized)', avoidance.updateMap, states, iters)
+    print(f'speedup: {before / after:.1f}x')
+
+
+def bench_avoidance_incremental(states: list, iters: int) -> None:
+    '''
+    cellAvoidanceMap: full rebuild vs incremental updates over consecutive frames
+    '''
+    from AvoidanceMap import cellAvoidanceMap
+
+    frames = [frame for state in states for frame in random_walk(state, random.Random(0), 20)]
+    full = cellAvoidanceMap(frames[0], incremental=False)
+    incremental = cellAvoidanceMap(frames[0], incremental=True)
+    before = timed('updateMap (full rebuild)', full.updateMap, frames, iters)
+    after = timed('updateMap (incremental)', incremental.updateMap, frames, iters)
+    print(f'speedup: {before / after:.1f}x, layer recomputations: {incremental.layer_stats}')
+
+
+def bench_decode(states: list, iters: int) -> None:
+    '''
+    GameState.update: frames decoded per second
+    '''
+    messages = [state.serialize() for state in states]
+    g = GameState()
+    elapsed = timed('GameState.update', g.update, messages, iters * 50)
+    print(f'{1 / elapsed:,.0f} frames/s')
+
+
+def bench_slots(states: list, iters: int) -> None:
+    '''
+    Location, Ghost and ServerMessage: slotted classes vs dict-backed equivalents
+    (subclasses without __slots__, which get a per-instance __dict__ like the originals)
+    '''
+    class DictLocation(Location):
+        pass
+
+    class DictGhost(Ghost):
+        pass
+
+    class DictServerMessage(ServerMessage):
+        pass
+
+    def make_entities(location_cls, ghost_cls, message_cls) -> list:
+        # The entities of one cloned game state: 4 ghosts, Pacman, fruit and a queued message
+        state = states[0]
+        entities = [ghost_cls(color, state) for color in GhostColors]
+        for ghost in entities:
+            ghost.location = location_cls(state)
+        entities += [location_cls(state), location_cls(state), message_cls(b'w', 1)]
+        return entities
+
+    def clone_ghosts(ghost_cls, location_cls) -> None:
+        # Copy the ghosts of a state field by field, as a rollout would
+        for ghost in states[0].ghosts:
+            copy = ghost_cls(ghost.color, ghost.state)
+            copy.location = location_cls(ghost.state)
+            copy.location.row, copy.location.col = ghost.location.row, ghost.location.col
+            copy.location.rowDir, copy.location.colDir = ghost.location.rowDir, ghost.location.colDir
+            copy.frightSteps, copy.spawning = ghost.frightSteps, ghost.spawning
+            copy.plannedDirection = ghost.plannedDirection
+
+    clones = 10000
+    for label, classes in (('dict-backed', (DictLocation, DictGhost, DictServerMessage)),
+                           ('slotted', (Location, Ghost, ServerMessage))):
+        tracemalloc.start()
+        kept = [make_entities(*classes) for _ in range(clones)]
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del kept
+        print(f'{label:<12} {size / clones:8.0f} bytes of entities per cloned state')
+
+        ghost_cls, location_cls = classes[1], classes[0]
+        timed(f'{label} ghost cloning (4 ghosts)', lambda _: clone_ghosts(ghost_cls, location_cls), states, iters * 20)
+
+
+def bench_clone(states: list, iters: int) -> None:
+    '''
+    Branching a game state: compress/decompress round trip vs clone and restore
+    '''
+    scratch = GameState()
+    timed('compressGameState + decompressGameState',
+          lambda g: decompressGameState(scratch, compressGameState(g)), states, iters * 20)
+    timed('GameState.clone', GameState.clone, states, iters * 20)
+    timed('GameState.restore', scratch.restore, states, iters * 20)
+
+
+def bench_rollout(states: list, iters: int) -> None:
+    '''
+    Random rollouts branched from one state: GameState.simulateAction on clones vs
+    BatchSimulator, whose throughput grows with the number of lanes
+    '''
+    from BatchSimulator import BatchSimulator
+
+    depth, numTicks = 10, 12
+    rng = random.Random(0)
+    plans = [[rng.choice(list(Directions)[:4]) for _ in range(depth)] for _ in range(4096)]
+
+    def sequential(root: GameState) -> None:
+        for plan in plans[:64]:
+            g = root.clone()
+            for direction in plan:
+                if not g.simulateAction(numTicks, direction):
+                    break
+
+    before = timed('simulateAction on 64 clones', sequential, states, iters)
+    print(f'{64 * depth / before:,.0f} simulated steps/s')
+    for lanes in (64, 256, 1024, 4096):
+        actions = plans[:lanes]
+        after = timed(f'BatchSimulator with {lanes} lanes',
+                      lambda root: BatchSimulator([root] * lanes).rollout(actions, numTicks),
+                      states[:max(1, 64 * len(states) // lanes)], iters)
+        print(f'{lanes * depth / after:,.0f} simulated steps/s, {lanes * depth / after / (64 * depth / before):.1f}x')
+
+
+def bench_mcts(states: list, iters: int) -> None:
+    '''
+    MCTSDecisionModule: search throughput for a few time budgets and rollout depths,
+    and the longest search against the budget (with and without rollout workers)
+    '''
+    from RolloutPool import RolloutPool
+    from mcts_module import MCTSDecisionModule
+
+    def run(budget_ms, depth: int, pool=None) -> None:
+        totals = {'nodes': 0, 'steps': 0, 'iterations': 0, 'search_time': 0.0}
+        longest = 0.0
+        for state in states[:iters]:
+            mcts = MCTSDecisionModule(state, budget_ms=budget_ms, rollout_depth=depth, pool=pool)
+            mcts.search()
+            longest = max(longest, mcts.stats['search_time'])
+            for key in totals:
+                totals[key] += mcts.stats[key]
+        print(f'budget {mcts.budget * 1e3:5.1f} ms, depth {depth:2d}{" (pool)" if pool else "       "}: '
+              f'{totals["nodes"] / totals["search_time"]:8,.0f} nodes/s, '
+              f'{totals["steps"] / totals["search_time"]:8,.0f} rollout steps/s, '
+              f'{totals["iterations"] / min(iters, len(states)):4.0f} iterations/decision, '
+              f'longest search {longest * 1e3:5.1f} ms')
+
+    for budget_ms, depth in ((None, 10), (10, 10), (None, 5), (None, 20)):
+        run(budget_ms, depth)
+
+    pool = RolloutPool(3)
+    try:
+        run(None, 10, pool)
+    finally:
+        pool.shutdown()
+
+
+def bench_pool(states: list, iters: int) -> None:
+    '''
+    RolloutPool: first-move rollouts per decision with warm workers, and the cost of
+    starting a pool per decision instead
+    '''
+    from RolloutPool import RolloutPool
+    from mcts_module import legal_moves
+
+    budget = 0.05
+    start = perf_counter()
+    pool = RolloutPool()
+    print(f'pool of {pool.workers} workers started in {(perf_counter() - start) * 1e3:.1f} ms')
+
+    for state in states[:iters]:
+        pool.evaluate(state, legal_moves(state), budget)
+    s = pool.stats
+    print(f'{s["rollouts"] / s["batches"]:.0f} rollouts per {budget * 1e3:.0f} ms decision, '
+          f'{s["dropped"]}/{s["tasks"]} tasks dropped')
+    pool.shutdown()
+
+    def cold(g: GameState) -> None:
+        pool = RolloutPool()
+        pool.evaluate(g, legal_moves(g), 0.001)
+        pool.shutdown()
+
+    timed('new pool per decision (1 ms budget)', cold, states[:3], 1)
+
+
+def bench_ghost_plan(states: list, iters: int) -> None:
+    '''
+    Ghost plan prediction: scanning the directions vs the precomputed plan table,
+    and the effect on simulateAction
+    '''
+    from gameState import createGhostPlanTable
+
+    createGhostPlanTable.cache_clear()
+    start = perf_counter()
+    createGhostPlanTable(tuple(states[0].wallArr))
+    print(f'plan table built in {(perf_counter() - start) * 1e3:.1f} ms')
+
+    ghosts = [ghost for state in states for ghost in state.ghosts]
+    before = timed('Ghost.guessPlanScan', Ghost.guessPlanScan, ghosts, iters * 10)
+    after = timed('Ghost.guessPlan (table)', Ghost.guessPlan, ghosts, iters * 10)
+    print(f'speedup: {before / after:.1f}x')
+
+    def simulate(plan) -> None:
+        Ghost.guessPlan, original = plan, Ghost.guessPlan
+        try:
+            for state in states:
+                g = state.clone()
+                for _ in range(10):
+                    g.simulateAction(12, Directions.LEFT)
+        finally:
+            Ghost.guessPlan = original
+
+    timed(f'{len(states)} states x 10 simulateAction (scan)', lambda _: simulate(Ghost.guessPlanScan), [None], iters)
+    timed(f'{len(states)} states x 10 simulateAction (table)', lambda _: simulate(Ghost.guessPlan), [None], iters)
+
+
+def bench_pellet_count(states: list, iters: int) -> None:
+    '''
+    GameState.numPellets: recounting the rows on every call vs the incremental
+    counter, over a full simulated game (Pacman eats every pellet, ghosts stay home)
+    '''
+    from DistMatrix import RoutingTable
+
+    start = GameState()
+    start.setPellets(initPelletArr)
+    start.gameMode = GameModes.CHASE
+    start.pacmanLoc.row, start.pacmanLoc.col = 23, 13
+    routes = RoutingTable(start)
+
+    # Record a game: walk to the nearest pellet until none are left
+    g, actions = start.clone(), []
+    while g.numPellets() > 0:
+        here = (g.pacmanLoc.row, g.pacmanLoc.col)
+        dist = routes.distTable[routes.maze.tile_to_id[here]].astype(np.int64)
+        pellets = (np.asarray(g.pelletArr, dtype=np.int64)[routes.maze.rows] >> routes.maze.cols) & 1
+        target = routes.maze.tiles[int(np.argmin(np.where(pellets == 1, dist, dist.max() + 1)))]
+        actions.append(routes.next_step(here, target))
+        g.simulateAction(12, actions[-1])
+    print(f'{len(actions)} moves to clear {start.numPellets()} pellets')
+
+    def replay(_) -> None:
+        g = start.clone()
+        for direction in actions:
+            g.simulateAction(12, direction)
+
+    before = timed('full game, numPellets recounts rows', lambda _: with_method(
+        GameState, 'numPellets', GameState.countPellets, replay), [None], iters)
+    after = timed('full game, incremental pellet counter', replay, [None], iters)
+    print(f'speedup: {before / after:.2f}x')
+
+
+@contextmanager
+def frame_server(frames: list, sent: list | None = None):
+    '''
+    Serve the given serialized frames at 24 fps to each client that connects, from
+    a local websocket server on its own thread (appending the perf_counter() time
+    each frame was sent at to sent, if given)
+    @return:
+        - str, the URL to connect to
+    '''
+    import asyncio
+    import threading
+    import websockets.server
+
+    async def stream(connection) -> None:
+        if sent is not None:
+            sent.clear()
+        for frame in frames:
+            await connection.send(frame)
+            if sent is not None:
+                sent.append(perf_counter())
+            await asyncio.sleep(1 / 24)
+        await connection.close()
+
+    ready = threading.Event()
+    server = {}
+
+    def serve() -> None:
+        async def main() -> None:
+            async with websockets.server.serve(stream, '127.0.0.1', 0) as ws:
+                server['port'] = ws.sockets[0].getsockname()[1]
+                server['stop'] = asyncio.get_running_loop().create_future()
+                ready.set()
+                await server['stop']
+        server['loop'] = asyncio.new_event_loop()
+        server['loop'].run_until_complete(main())
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    ready.wait()
+    try:
+        yield f'ws://127.0.0.1:{server["port"]}'
+    finally:
+        server['loop'].call_soon_threadsafe(server['stop'].set_result, None)
+        thread.join()
+
+
+def bench_receive(states: list, iters: int) -> None:
+    '''
+    Client receive loop against a local server streaming frames at 24 fps: blocking
+    recv() (old client) vs asyncio recv(), with a decision task and a 5 ms timer task
+    sharing the event loop. Reports frame-to-decision latency and timer lateness.
+    '''
+    import asyncio
+    import websockets.client
+    import websockets.sync.client
+    from LatencyStats import LatencyStats
+
+    frames = [frame.serialize() for frame in random_walk(states[0], random.Random(0), 24 * max(1, iters // 10))]
+
+    async def run(url: str, blocking: bool) -> LatencyStats:
+        stats, g, done = LatencyStats(), GameState(), asyncio.Event()
+
+        async def receive() -> None:
+            if blocking:
+                connection = websockets.sync.client.connect(url)
+                recv = lambda: connection.recv()
+            else:
+                connection = await websockets.client.connect(url)
+                recv = connection.recv
+            try:
+                while True:
+                    message = recv() if blocking else await recv()
+                    g.update(message)
+                    await asyncio.sleep(0)
+            except websockets.exceptions.ConnectionClosed:
+                done.set()
+
+        async def decide() -> None:
+            lastFrame = 0
+            while not done.is_set():
+                await asyncio.sleep(0)
+                if g.frameCount != lastFrame:
+                    lastFrame = g.frameCount
+                    end = perf_counter() + 0.002
+                    while perf_counter() < end:
+                        pass
+                    stats.record('frame_to_decision', perf_counter() - g.frameTime)
+
+        async def timer() -> None:
+            while not done.is_set():
+                start = perf_counter()
+                await asyncio.sleep(0.005)
+                stats.record('timer_lateness', perf_counter() - start - 0.005)
+
+        await asyncio.gather(receive(), decide(), timer())
+        return stats
+
+    with frame_server(frames) as url:
+        for blocking in (True, False):
+            print(f'{"blocking" if blocking else "asyncio"} recv, {len(frames)} frames:')
+            print(asyncio.run(run(url, blocking)).summary())
+
+
+def bench_decision_wait(states: list, iters: int) -> None:
+    '''
+    Decision loop waiting for frames from a local server at 24 fps: polling currTicks
+    with asyncio.sleep(0) (old robot mode) vs GameState.waitForFrame. Reports the
+    client's CPU usage and the frame-to-decision latency.
+    '''
+    import asyncio
+    import websockets.client
+    from LatencyStats import LatencyStats
+
+    frames = [frame.serialize() for frame in random_walk(states[0], random.Random(0), 24 * max(1, iters // 10))]
+
+    async def run(url: str, poll: bool) -> tuple[LatencyStats, float]:
+        stats, g = LatencyStats(), GameState()
+
+        async def receive() -> None:
+            connection = await websockets.client.connect(url)
+            g.setConnectionStatus(True)
+            try:
+                while True:
+                    g.update(await connection.recv())
+                    await asyncio.sleep(0)
+            except websockets.exceptions.ConnectionClosed:
+                g.setConnectionStatus(False)
+
+        async def decide() -> None:
+            lastTicks = -1
+            while not g.isConnected():
+                await asyncio.sleep(0.001)
+            while g.isConnected():
+                if poll:
+                    await asyncio.sleep(0)
+                    if g.currTicks == lastTicks or not g.serverFrames:
+                        continue
+                    lastTicks = g.currTicks
+                else:
+                    await g.waitForFrame()
+                    if not g.isConnected():
+                        break
+                stats.record('frame_to_decision', perf_counter() - g.frameTime)
+
+        wall, cpu = perf_counter(), process_time()
+        await asyncio.gather(receive(), decide())
+        return stats, (process_time() - cpu) / (perf_counter() - wall)
+
+    with frame_server(frames) as url:
+        for poll in (True, False):
+            stats, usage = asyncio.run(run(url, poll))
+            print(f'{"polling" if poll else "waitForFrame"}, {len(frames)} frames: {usage:.0%} CPU')
+            print(stats.summary())
+
+
+def bench_coalesce(states: list, iters: int) -> None:
+    '''
+    Receive loop with a 100 ms decision per frame against a local server at 24 fps:
+    applying every frame in order vs only the newest queued one. Reports the age of
+    the state each decision ran on (time since the server sent it).
+    '''
+    import asyncio
+    import websockets.client
+    from LatencyStats import LatencyStats
+
+    frames = [frame.serialize() for frame in random_walk(states[0], random.Random(0), 24 * max(2, iters // 5))]
+    firstTicks = states[0].currTicks + 1 # frame i has tick firstTicks + i
+
+    async def run(url: str, coalesce: bool) -> tuple[LatencyStats, int]:
+        stats, g, skipped = LatencyStats(), GameState(), 0
+
+        async def read(connection, frames: asyncio.Queue) -> None:
+            try:
+                while True:
+                    await frames.put(await connection.recv())
+            except websockets.exceptions.ConnectionClosed:
+                await frames.put(None)
+
+        async def receive() -> None:
+            nonlocal skipped
+            connection = await websockets.client.connect(url)
+            frames = asyncio.Queue(32)
+            reader = asyncio.create_task(read(connection, frames))
+            g.setConnectionStatus(True)
+            closed = False
+            while not closed and (message := await frames.get()) is not None:
+                while coalesce and not frames.empty():
+                    newer = frames.get_nowait()
+                    if newer is None: # connection closed after this frame
+                        closed = True
+                        break
+                    message = newer
+                    skipped += 1
+                g.update(message)
+                await asyncio.sleep(0)
+            g.setConnectionStatus(False)
+            await reader
+
+        async def decide() -> None:
+            while not g.isConnected():
+                await asyncio.sleep(0.001)
+            while g.isConnected():
+                await g.waitForFrame()
+                end = perf_counter() + 0.1
+                while perf_counter() < end:
+                    pass
+                stats.record('state_age', perf_counter() - sent[g.currTicks - firstTicks])
+
+        await asyncio.gather(receive(), decide())
+        return stats, skipped
+
+    sent = []
+    with frame_server(frames, sent) as url:
+        for coalesce in (False, True):
+            stats, skipped = asyncio.run(run(url, coalesce))
+            print(f'{"latest frame wins" if coalesce else "every frame"}, {len(frames)} frames, {skipped} skipped:')
+            print(stats.summary())
+
+
+def bench_startup(states: list, iters: int) -> None:
+    '''
+    Cold import time of each strategy's decision module in a fresh interpreter, with
+    the modules taking the most time on their own (from python -X importtime)
+    '''
+    import subprocess
+    import sys
+
+    strategies = {'astar': 'decisionModule', 'mcts': 'mcts_module', 'dqn': 'dqn_module'}
+    for strategy, module in strategies.items():
+        times, selfTimes = [], {}
+        for _ in range(max(1, iters // 4)):
+            result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                    capture_output=True, text=True)
+            if result.returncode != 0:
+                error = result.stderr.strip().splitlines()[-1]
+                break
+            for line in result.stderr.splitlines():
+                if not line.startswith('import time:') or 'self [us]' in line:
+                    continue
+                selfUs, cumulativeUs, name = line[len('import time:'):].split('|')
+                selfTimes[name.strip()] = selfTimes.get(name.strip(), 0) + int(selfUs)
+                if name.strip() == module:
+                    times.append(int(cumulativeUs) / 1e6)
+        if not times:
+            print(f'{strategy:6} import {module}: failed ({error})')
+            continue
+        slowest = sorted(selfTimes.items(), key=lambda item: -item[1])[:5]
+        print(f'{strategy:6} import {module}: {min(times) * 1e3:7.1f} ms (best of {len(times)}), slowest: ' +
+              ', '.join(f'{name} {us / len(times) / 1e3:.1f} ms' for name, us in slowest))
+
+
+def bench_observation(states: list, iters: int) -> None:
+    '''
+    DQN observation: building it from scratch every frame vs the incremental
+    DQNObservation, over consecutive frames
+    '''
+    from DQNObservation import DQNObservation, buildObservation
+
+    rng = random.Random(0)
+    walks = [random_walk(state, rng, 50) for state in states]
+    frames = sum(len(walk) for walk in walks)
+
+    def observe(build):
+        for walk in walks:
+            lastGhostPos = [(32, 32)] * 4
+            for frame in walk:
+                yield build(frame, lastGhostPos)
+                lastGhostPos = [(ghost.location.row, ghost.location.col) for ghost in frame.ghosts]
+
+    def replay(build) -> None:
+        for _ in observe(build):
+            pass
+
+    builder = DQNObservation(tuple(states[0].wallArr))
+    before = timed(f'buildObservation x {frames} frames', lambda _: replay(buildObservation), [None], iters)
+    after = timed(f'DQNObservation.build x {frames} frames', lambda _: replay(builder.build), [None], iters)
+    print(f'speedup: {before / after:.1f}x ({after / frames * 1e6:.1f} us per frame)')
+
+
+def bench_observation_key(states: list, iters: int) -> None:
+    '''
+    DQN Q-value cache key: cost of observationKey vs building the observation it
+    saves on a hit
+    '''
+    from DQNObservation import DQNObservation, observationKey
+
+    rng = random.Random(0)
+    walks = [random_walk(state, rng, 50) for state in states]
+    frames = [(frame, lastGhostPos) for walk in walks
+              for frame, lastGhostPos in zip(walk, [[(32, 32)] * 4] +
+                  [[(ghost.location.row, ghost.location.col) for ghost in frame.ghosts] for frame in walk])]
+
+    builder = DQNObservation(tuple(states[0].wallArr))
+    build = timed(f'DQNObservation.build x {len(frames)} frames',
+                  lambda _: [builder.build(frame, last) for frame, last in frames], [None], iters)
+    key = timed(f'observationKey x {len(frames)} frames',
+                lambda _: [observationKey(frame, last) for frame, last in frames], [None], iters)
+    print(f'key: {key / len(frames) * 1e6:.1f} us per frame ({key / build:.0%} of an observation, '
+          f'before the forward pass it also saves)')
+
+
+def with_method(cls, name: str, method, fn) -> None:
+    '''
+    Run fn() with a method of cls temporarily replaced
+    '''
+    original = getattr(cls, name)
+    setattr(cls, name, method)
+    try:
+        fn(None)
+    finally:
+        setattr(cls, name, original)
+
+
+BENCHMARKS = {
+    'avoidance': bench_avoidance,
+    'avoidance_incremental': bench_avoidance_incremental,
+    'decode': bench_decode,
+    'slots': bench_slots,
+    'clone': bench_clone,
+    'rollout': bench_rollout,
+    'mcts': bench_mcts,
+    'pool': bench_pool,
+    'ghost_plan': bench_ghost_plan,
+    'pellet_count': bench_pellet_count,
+    'receive': bench_receive,
+    'decision_wait': bench_decision_wait,
+    'coalesce': bench_coalesce,
+    'startup': bench_startup,
+    'observation': bench_observation,
+    'observation_key': bench_observation_key,
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bot client microbenchmarks')
+    parser.add_argument('benchmark', choices=[*BENCHMARKS, 'all'])
+    parser.add_argument('--iters', type=int, default=20, help='Passes over the sampled states')
+    parser.add_argument('--states', type=int, default=50, help='Number of random game states')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    states = [random_state(rng) for _ in range(args.states)]
+    for name, bench in BENCHMARKS.items():
+        if args.benchmark in (name, 'all'):
+            print(f'--- {name} ---')
+            bench(states, args.iters)
@@ -1,16 +1,16 @@
-import asyncio
 import os
 import random
-from time import time
+from time import perf_counter, time
+
+import numpy as np
 
 from gameState import *
 from debugServer import DebugServer
 from utils import get_distance, get_walkable_tiles
-from DistMatrix import createDistTable, createDistTableDict, loadDistTable, loadDistTableDict
 from pathfinding import find_path
 from AvoidanceMap import cellAvoidanceMap
-import low_level
-from low_level import send_direction, unstuck
+from low_level import send_direction, unstuck, wait_for_turn
+from LatencyStats import latencyStats
 
 # UNCOMMENT GPIO CODE IF RUNNING ON ACTUAL ROBOT (NOT SIMULATOR)
 #import RPi.GPIO as GPIO
@@ -67,9 +67,12 @@ class DecisionModule:
 	programming for Pacbot, using asyncio.
 	'''
 
-	def __init__(self, state: GameState, log: bool, hybrid_mode: bool = False, force_no_bot: bool = False) -> None:
+	def __init__(self, state: GameState, log: bool, hybrid_mode: bool = False, force_no_bot: bool = False,
+	             pacing: str = 'fixed') -> None:
 		self.state = state
 		self.force_no_bot = force_no_bot
+		# Decision pacing in simulation (see low_level.wait_for_turn)
+		self.pacing = pacing
 		# Next tile Pacman should move to (never more than 1 cell from current pos)
 		self.targetPos = (state.pacmanLoc.row, state.pacmanLoc.col)
 		self.destination = self.targetPos  # final A* destination (not just next step)
@@ -77,13 +80,10 @@ class DecisionModule:
 		self.walkable_cells = get_walkable_tiles(state)
 		self.avoidance_map = cellAvoidanceMap(state, hybrid_mode=hybrid_mode)
 
-		if not os.path.isfile('./static/distTable.json'):
-			createDistTable(self.state)
-		if not os.path.isfile('./static/dtDict.json'):
-			createDistTableDict(self.state)
-
-		self.distTable = loadDistTable()
-		self.dtDict = loadDistTableDict()
+		# Precomputed maze distances and shortest-path next hops
+		self.routes = self.avoidance_map.routes
+		# Paths taken from the routing table vs searched with A*
+		self.route_stats = {'table': 0, 'search': 0}
 		self.log = log
 		self.lastMovementTime = None
 		self.STUCK_THRESHOLD = 3  # seconds
@@ -98,7 +98,8 @@ class DecisionModule:
 
 		n = self.state.numPellets()
 		self.avoidance_map.num_pellets = n
-		self.avoidance_map.updateMap(self.state)
+		with latencyStats.span('updateMap'):
+			self.avoidance_map.updateMap(self.state)
 
 		if n > 100:
 			radius = 10
@@ -107,18 +108,19 @@ class DecisionModule:
 		else:
 			radius = 20
 
-		avoidanceScores = {}
-		for i in range(-radius, radius+1):
-			for j in range(-radius, radius+1):
-				cell = (pacmanPos[0] + i, pacmanPos[1] + j)
-				if cell in self.avoidance_map.avoidance_map:
-					avoidanceScores[cell] = (
-						self.avoidance_map.avoidance_map[cell]
-						+ get_distance(pacmanPos, cell)
-					)
-
-		if avoidanceScores:
-			target = min(avoidanceScores, key=avoidanceScores.get)
+		# Candidate targets: walkable tiles within the radius (ids are row-major,
+		# so argmin breaks ties the same way as scanning the square row by row)
+		maze = self.avoidance_map.maze
+		drow = maze.rows.astype(np.int64) - pacmanPos[0]
+		dcol = maze.cols.astype(np.int64) - pacmanPos[1]
+		candidates = np.flatnonzero((np.abs(drow) <= radius) & (np.abs(dcol) <= radius))
+
+		if len(candidates):
+			avoidanceScores = (
+				self.avoidance_map.scores[candidates]
+				+ np.sqrt(dcol[candidates] * dcol[candidates] + drow[candidates] * drow[candidates])
+			)
+			target = maze.tiles[candidates[np.argmin(avoidanceScores)]]
 			self.destination = target
 		else:
 			while True:
@@ -133,7 +135,17 @@ class DecisionModule:
 					self.destination = target
 					break
 
-		path = find_path(pacmanPos, target, self.state, self.avoidance_map, self.log)
+		# Shortest route from the next-hop table, unless a ghost threatens it: then
+		# search around the threat with A* on the avoidance map
+		path = self.routes.path(pacmanPos, target)
+		if path and self.avoidance_map.ghost_free(path):
+			self.route_stats['table'] += 1
+		else:
+			self.route_stats['search'] += 1
+			with latencyStats.span('find_path'):
+				path = find_path(pacmanPos, target, self.state, self.avoidance_map, self.log)
+			if not isinstance(path, list): # A* failed, fall back to the plain shortest path
+				path = self.routes.path(pacmanPos, target)
 		DebugServer.instance.set_path(path)
 
 		if len(path) >= 1:
@@ -177,7 +189,8 @@ class DecisionModule:
 		absDelta = abs(deltaRow) + abs(deltaCol)
 
 		if absDelta != 1:
-			self.update_target_loc()
+			with latencyStats.span('update_target_loc'):
+				self.update_target_loc()
 			deltaRow = self.targetPos[0] - pacmanPos[0]
 			deltaCol = self.targetPos[1] - pacmanPos[1]
 			absDelta = abs(deltaRow) + abs(deltaCol)
@@ -189,29 +202,24 @@ class DecisionModule:
 	async def decisionLoop(self) -> None:
 		'''
 		Two modes depending on low_level.connected:
-		  connected     — 0.2 s delay after each move
+		  connected     — act once per server frame, idle in between
 		  not connected — 3 pacbot moves per 2 ghost moves; ghosts move every
-		                  12 ticks at 24 fps = 0.5 s, so sleep 1/3 s per move
+		                  12 ticks at 24 fps = 0.5 s, so one move per 1/3 s
+		                  ('fixed') or per 8 ticks ('ticks'), or once per
+		                  frame ('frames'), depending on self.pacing
 
 		Calls send_direction only when the output direction changes.
 		'''
-		last_ticks = -1
 		last_direction = Directions.NONE
 		stuck_pos = None
 		stuck_start = None
 		unstuck_triggered = False
 
 		while self.state.isConnected():
-			if low_level.connected:
-				# Physical robot: at most one move per server tick
-				await asyncio.sleep(0)
-				if self.state.currTicks == last_ticks:
-					continue
-				last_ticks = self.state.currTicks
-			else:
-				# Simulation: 3 pacbot moves per 2 ghost moves = 1 move per 1/3 s
-				await asyncio.sleep(1 / 3)
-				last_ticks = self.state.currTicks
+			# Physical robot: once per server frame; simulation: see self.pacing
+			await wait_for_turn(self.state, self.pacing)
+			if not self.state.isConnected():
+				break
 
 			if self.state.gameMode == GameModes.PAUSED:
 				continue
@@ -221,7 +229,8 @@ class DecisionModule:
 
 			self.state.lock()
 
-			direction = self.get_direction()
+			with latencyStats.span('get_direction'):
+				direction = self.get_direction()
 			pacman_pos = (self.state.pacmanLoc.row, self.state.pacmanLoc.col)
 
 			if self.log:
@@ -230,6 +239,7 @@ class DecisionModule:
 
 			if direction != Directions.NONE:
 				self.state.queueAction(1, direction)
+				latencyStats.record('frame_to_command', perf_counter() - self.state.frameTime)
 
 			self.state.unlock()
 
@@ -252,6 +262,10 @@ class DecisionModule:
 					send_direction(direction)
 				last_direction = direction
 
+		if sum(self.route_stats.values()):
+			print(f'[A*] Paths: {self.route_stats["table"]} from the routing table, '
+			      f'{self.route_stats["search"]} searched')
+
 """
 ================================================.
      .-.   .-.     .--.                         |
@@ -1,33 +1,24 @@
-import asyncio
+import json
 import os
 import sys
+import zipfile
+from collections import OrderedDict
 
-import numpy as np
 import torch
 
 from gameState import GameState, GameModes, Directions
+from DQNObservation import DQNObservation, observationKey, OBS_CHANNELS, COMBO_MULTIPLIER, SUPER_PELLET_ROWS, SUPER_PELLET_COLS
 from debugServer import DebugServer
-from time import time
-import low_level
-from low_level import send_direction, unstuck
+from time import perf_counter, time
+from low_level import send_direction, unstuck, wait_for_turn
+from LatencyStats import latencyStats
 
-# Path to the curc-pacbot-rl model definitions
+# Path to the curc-pacbot-rl model definitions (only needed for training checkpoints)
 _RL_SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../curc-pacbot-rl/src')
-sys.path.insert(0, _RL_SRC)
-import models as _dqn_models  # noqa: E402
 
-# Observation / action constants (from pacbot_rs_2/variables.rs and game_modes.rs)
-OBS_SHAPE = torch.Size([17, 28, 31])
+# Observation / action constants (from pacbot_rs_2/variables.rs)
+OBS_SHAPE = torch.Size([OBS_CHANNELS, 28, 31])
 NUM_ACTIONS = 5
-GHOST_FRIGHT_STEPS = 40
-COMBO_MULTIPLIER = 200
-PELLET_POINTS = 10
-SUPER_PELLET_POINTS = 50
-FRUIT_POINTS = 100
-CHASE_DURATION = 180  # GameMode::CHASE.duration()
-
-SUPER_PELLET_ROWS = frozenset({3, 23})
-SUPER_PELLET_COLS = frozenset({1, 26})
 
 # DQN action index → Pacbot Directions enum
 # Rust Action enum: Stay=0, Down=1, Up=2, Left=3, Right=4
@@ -42,6 +33,64 @@ _ACTION_TO_DIR = [
 
 HYBRID_GHOST_RADIUS = 3
 
+# Lookahead (see DQNDecisionModule.lookahead_action): ticks per simulated move
+# (3 pacbot moves per 2 ghost moves of 12 ticks), and the discount and reward
+# scale of the backed-up values (as in training)
+LOOKAHEAD_TICKS = 8
+LOOKAHEAD_DISCOUNT = 0.99
+LOOKAHEAD_REWARD_SCALE = 1 / COMBO_MULTIPLIER
+
+# States whose Q-values are kept (least recently used first out)
+Q_CACHE_SIZE = 256
+
+
+def is_exported_model(path: str) -> bool:
+    '''
+    Whether a file is a TorchScript model (see export_dqn.py) rather than a training
+    checkpoint: both are zip archives, but only TorchScript ones hold code/
+    '''
+    if not zipfile.is_zipfile(path):
+        return False
+    with zipfile.ZipFile(path) as archive:
+        return any(name.split('/')[1:2] == ['code'] for name in archive.namelist())
+
+
+def load_checkpoint_model(checkpoint_path: str) -> tuple[torch.nn.Module, dict]:
+    '''
+    Build the eager model of a training checkpoint, from the curc-pacbot-rl model definitions
+    Returns the model (on the CPU, in eval mode) and its description
+    '''
+    if _RL_SRC not in sys.path:
+        sys.path.insert(0, _RL_SRC)
+    import models as dqn_models
+
+    loaded = torch.load(checkpoint_path, map_location='cpu', weights_only=False)
+    model_name: str = loaded.get('config', {}).get('model', 'QNetV2')
+    q_net = getattr(dqn_models, model_name)(OBS_SHAPE, NUM_ACTIONS)
+    q_net.load_state_dict(loaded['state_dict'])
+    q_net.eval()
+    return q_net, {'model': model_name, 'iter': loaded.get('iter_num', '?'), 'quantized': False}
+
+
+def load_q_net(path: str, device: torch.device) -> tuple[torch.nn.Module, dict]:
+    '''
+    Load a Q-network from a training checkpoint or an exported TorchScript model
+    Returns the model (in eval mode) and its description (model, iter, quantized);
+    quantized models stay on the CPU, the only device they run on
+    '''
+    if not is_exported_model(path):
+        q_net, info = load_checkpoint_model(path)
+        return q_net.to(device), info
+
+    extra_files = {'meta.json': ''}
+    q_net = torch.jit.load(path, map_location='cpu', _extra_files=extra_files)
+    q_net.eval()
+    info = {'model': '?', 'iter': '?', 'quantized': False, **json.loads(extra_files['meta.json'] or '{}')}
+    info['model'] = f'exported {info["model"]}'
+    if not info['quantized']:
+        q_net = q_net.to(device)
+    return q_net, info
+
 
 class DQNDecisionModule:
     '''
@@ -50,16 +99,52 @@ class DQNDecisionModule:
     '''
 
     def __init__(self, state: GameState, checkpoint_path: str, log: bool = False,
-                 hybrid_mode: bool = False, force_no_bot: bool = False) -> None:
+                 hybrid_mode: bool = False, force_no_bot: bool = False, pacing: str = 'fixed',
+                 num_threads: int = 0, lookahead: int = 0, cache_size: int = Q_CACHE_SIZE) -> None:
         self.state = state
         self.log = log
         self.hybrid_mode = hybrid_mode
         self.force_no_bot = force_no_bot
+        # Decision pacing in simulation (see low_level.wait_for_turn)
+        self.pacing = pacing
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         self._last_ghost_pos: list[tuple[int, int]] = [(32, 32)] * 4
         self._using_astar: bool = False
+
+        # Intra-op threads for inference (0 keeps torch's default of one per core,
+        # which contends with the event loop on the Pi)
+        if num_threads > 0:
+            torch.set_num_threads(num_threads)
+        print(f'[DQN] Inference on {torch.get_num_threads()} threads')
+
+        # Load the model before allocating tensors: int8 models run on the CPU
         self._load_model(checkpoint_path)
 
+        # Input tensor, reused every decision: on the CPU it shares the observation
+        # builder's buffer, so building the observation fills it in place
+        self._observation = DQNObservation(tuple(state.wallArr))
+        self._obs_cpu = torch.from_numpy(self._observation.obs).unsqueeze(0)  # (1,17,28,31)
+        self._obs_input = self._obs_cpu if self.device.type == 'cpu' else \
+            torch.empty(self._obs_cpu.shape, dtype=self._obs_cpu.dtype, device=self.device)
+
+        # Actions blocked by a wall from every cell of the grid
+        self._blocked_by_cell = torch.tensor(
+            [[self._blocked_actions(row, col) for col in range(28)] for row in range(31)],
+            dtype=torch.bool, device=self.device)  # (31, 28, 5)
+
+        # Simulated moves before evaluating the DQN (0 to act greedily on the current
+        # state), with the observation builder and batch buffer of the future states
+        self.lookahead = lookahead
+        self._lookahead_observation = DQNObservation(tuple(state.wallArr))
+        self._batch_cpu = torch.empty((NUM_ACTIONS ** max(1, lookahead), *OBS_SHAPE))
+        self._batch_np = self._batch_cpu.numpy()
+
+        # Masked Q-values by observationKey, so that unchanged states (robot stuck,
+        # game paused) skip the observation and the forward pass (0 disables it)
+        self._q_cache: OrderedDict[tuple, torch.Tensor] = OrderedDict()
+        self._q_cache_size = cache_size
+        self.q_cache_stats = {'hits': 0, 'misses': 0}
+
         if hybrid_mode:
             from decisionModule import DecisionModule
             self._astar = DecisionModule(state, log, hybrid_mode=True)
@@ -71,84 +156,36 @@ class DQNDecisionModule:
     # ------------------------------------------------------------------
 
     def _load_model(self, checkpoint_path: str) -> None:
-        loaded = torch.load(checkpoint_path, map_location='cpu', weights_only=False)
-        model_name: str = loaded.get('config', {}).get('model', 'QNetV2')
-        model_class = getattr(_dqn_models, model_name)
-        self.q_net = model_class(OBS_SHAPE, NUM_ACTIONS).to(self.device)
-        self.q_net.load_state_dict(loaded['state_dict'])
-        self.q_net.eval()
-        print(f'[DQN] Loaded {model_name} (iter={loaded.get("iter_num","?")}) on {self.device}')
+        self.q_net, info = load_q_net(checkpoint_path, self.device)
+        if info['quantized']:
+            self.device = torch.device('cpu')
+        int8 = ', int8' if info['quantized'] else ''
+        print(f'[DQN] Loaded {info["model"]} (iter={info["iter"]}{int8}) on {self.device}')
 
     # ------------------------------------------------------------------
-    # Observation construction
-    # Matches the 17-channel (channels, col, obs_row) format used during
-    # training, where obs_row = 30 - row (y-flipped from game coordinates).
+    # Observation construction (see DQNObservation for the format)
     # ------------------------------------------------------------------
 
     def _build_obs(self) -> torch.Tensor:
-        g = self.state
-        obs = np.zeros((17, 28, 31), dtype=np.float32)
-
-        # Channels 0 (walls) and 1 (rewards)
-        for row in range(31):
-            obs_row = 30 - row
-            for col in range(28):
-                if g.wallAt(row, col):
-                    obs[0, col, obs_row] = 1.0
-                if g.pelletAt(row, col):
-                    is_super = row in SUPER_PELLET_ROWS and col in SUPER_PELLET_COLS
-                    pts = SUPER_PELLET_POINTS if is_super else PELLET_POINTS
-                    obs[1, col, obs_row] = pts / COMBO_MULTIPLIER
-                elif g.fruitSteps > 0 and g.fruitLoc.row == row and g.fruitLoc.col == col:
-                    obs[1, col, obs_row] = FRUIT_POINTS / COMBO_MULTIPLIER
-
-        # Channels 2-3: Pacman (last pos reused as current; no tracking overhead)
-        pr, pc = g.pacmanLoc.row, g.pacmanLoc.col
-        if 0 <= pr < 31 and 0 <= pc < 28:
-            obs[2, pc, 30 - pr] = 1.0
-            obs[3, pc, 30 - pr] = 1.0
-
-        # Channels 4-7: ghost current positions
-        # Channels 8-11: ghost last positions (from previous step)
-        # Channels 12-14: mode state at ghost location
-        for i, ghost in enumerate(g.ghosts):
-            gr, gc = ghost.location.row, ghost.location.col
-            if 0 <= gr < 31 and 0 <= gc < 28:
-                gobs = 30 - gr
-                obs[4 + i, gc, gobs] = 1.0
-                if ghost.isFrightened():
-                    obs[14, gc, gobs] = ghost.frightSteps / GHOST_FRIGHT_STEPS
-                else:
-                    progress = g.modeSteps / CHASE_DURATION
-                    ch = 13 if g.gameMode == GameModes.CHASE else 12
-                    obs[ch, gc, gobs] = progress
-
-            lgr, lgc = self._last_ghost_pos[i]
-            if 0 <= lgr < 31 and 0 <= lgc < 28:
-                obs[8 + i, lgc, 30 - lgr] = 1.0
-
-        # Channel 15: ticks_per_step / update_period (1.0 approximation)
-        obs[15, :, :] = 1.0
-
-        # Channel 16: super pellet locations
-        for row in SUPER_PELLET_ROWS:
-            for col in SUPER_PELLET_COLS:
-                if g.pelletAt(row, col):
-                    obs[16, col, 30 - row] = 1.0
-
-        return torch.from_numpy(obs).unsqueeze(0).to(self.device)  # (1,17,28,31)
+        self._observation.build(self.state, self._last_ghost_pos)
+        if self._obs_input is not self._obs_cpu:
+            self._obs_input.copy_(self._obs_cpu, non_blocking=True)
+        return self._obs_input  # (1,17,28,31)
 
     # ------------------------------------------------------------------
-    # Action mask: True = action is physically reachable
+    # Action mask: True = action is blocked by a wall
     # ------------------------------------------------------------------
 
-    def _get_action_mask(self) -> torch.Tensor:
-        g = self.state
-        row, col = g.pacmanLoc.row, g.pacmanLoc.col
+    def _blocked_actions(self, row: int, col: int) -> list[bool]:
         # Order matches Action enum: Stay, Down, Up, Left, Right
-        deltas = [(0, 0), (1, 0), (-1, 0), (0, -1), (0, 1)]
-        mask = [True] + [not g.wallAt(row + dr, col + dc) for dr, dc in deltas[1:]]
-        return torch.tensor(mask, dtype=torch.bool).unsqueeze(0).to(self.device)
+        deltas = [(1, 0), (-1, 0), (0, -1), (0, 1)]
+        return [False] + [self.state.wallAt(row + dr, col + dc) for dr, dc in deltas]
+
+    def _get_blocked_mask(self, g: GameState) -> torch.Tensor:
+        row, col = g.pacmanLoc.row, g.pacmanLoc.col
+        if 0 <= row < 31 and 0 <= col < 28:
+            return self._blocked_by_cell[row, col]  # (5,), a view of the table
+        return torch.tensor(self._blocked_actions(row, col), dtype=torch.bool, device=self.device)
 
     # ------------------------------------------------------------------
     # Hybrid-mode helper
@@ -203,13 +240,7 @@ class DQNDecisionModule:
             print('[DQN] Hybrid: switching to RL (no frightened ghosts, ghost far)')
             DebugServer.instance.reset_cell_colors()
 
-        obs = self._build_obs()
-        mask = self._get_action_mask()
-
-        with torch.no_grad():
-            q_vals = self.q_net(obs)        # (1, 5)
-            q_vals[~mask] = -float('inf')
-            action = int(q_vals.argmax(dim=1).item())
+        action = self.lookahead_action(self.lookahead) if self.lookahead > 0 else self._greedy_action()
 
         # Record ghost positions for the next step's last-position channels
         for i, ghost in enumerate(self.state.ghosts):
@@ -221,35 +252,160 @@ class DQNDecisionModule:
 
         return _ACTION_TO_DIR[action]
 
+    def _greedy_action(self) -> int:
+        key = observationKey(self.state, self._last_ghost_pos)
+        q_vals = self._cached_q(key)
+
+        with torch.inference_mode():
+            if q_vals is None:
+                with latencyStats.span('_build_obs'):
+                    obs = self._build_obs()
+                blocked = self._get_blocked_mask(self.state).unsqueeze(0)
+                with latencyStats.span('dqn_forward'):
+                    q_vals = self.q_net(obs)    # (1, 5)
+                q_vals = q_vals.masked_fill_(blocked, -float('inf'))[0].cpu()
+                self._cache_q(key, q_vals)
+            return int(q_vals.argmax().item())
+
+    # ------------------------------------------------------------------
+    # Q-value cache
+    # ------------------------------------------------------------------
+
+    def _cached_q(self, key: tuple) -> torch.Tensor | None:
+        if self._q_cache_size <= 0:
+            return None
+        q_vals = self._q_cache.get(key)
+        if q_vals is None:
+            self.q_cache_stats['misses'] += 1
+            return None
+        self._q_cache.move_to_end(key)
+        self.q_cache_stats['hits'] += 1
+        return q_vals
+
+    def _cache_q(self, key: tuple, q_vals: torch.Tensor) -> None:
+        if self._q_cache_size <= 0:
+            return
+        self._q_cache[key] = q_vals
+        if len(self._q_cache) > self._q_cache_size:
+            self._q_cache.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # Lookahead: simulate moves with GameState.simulateAction, and evaluate
+    # all the resulting states in one batched forward pass
+    # ------------------------------------------------------------------
+
+    def evaluate_states(self, states: list[GameState],
+                        last_ghost_pos: list[list[tuple[int, int]]]) -> torch.Tensor:
+        '''
+        Q-values of a batch of states, with the actions blocked by walls at -inf: the
+        states missing from the cache are evaluated in one forward pass. last_ghost_pos
+        holds the ghost positions of the step before each state. Returns a
+        (len(states), 5) tensor on the CPU
+        '''
+        keys = [observationKey(g, last) for g, last in zip(states, last_ghost_pos)]
+        rows = [self._cached_q(key) for key in keys]
+        misses = [i for i, q_vals in enumerate(rows) if q_vals is None]
+
+        with torch.inference_mode():
+            if misses:
+                n = len(misses)
+                if n > len(self._batch_cpu):
+                    self._batch_cpu = torch.empty((n, *OBS_SHAPE))
+                    self._batch_np = self._batch_cpu.numpy()
+
+                with latencyStats.span('_build_obs'):
+                    for j, i in enumerate(misses):
+                        self._batch_np[j] = self._lookahead_observation.build(states[i], last_ghost_pos[i])
+                blocked = torch.stack([self._get_blocked_mask(states[i]) for i in misses])
+
+                with latencyStats.span('dqn_batch_forward'):
+                    q_vals = self.q_net(self._batch_cpu[:n].to(self.device))    # (n, 5)
+                q_vals = q_vals.masked_fill_(blocked, -float('inf')).cpu()
+                for j, i in enumerate(misses):
+                    rows[i] = q_vals[j].clone()
+                    self._cache_q(keys[i], rows[i])
+
+            return torch.stack(rows) if rows else torch.empty((0, NUM_ACTIONS))
+
+    def _simulate_moves(self, g: GameState) -> list[tuple[int, GameState | None, float]]:
+        '''
+        (action, resulting state or None if Pacman is caught, scaled reward) for each
+        action that is not blocked by a wall
+        '''
+        moves = []
+        for action, blocked in enumerate(self._blocked_actions(g.pacmanLoc.row, g.pacmanLoc.col)):
+            if blocked:
+                continue
+            child = g.clone()
+            alive = child.simulateAction(LOOKAHEAD_TICKS, _ACTION_TO_DIR[action])
+            reward = (child.currScore - g.currScore) * LOOKAHEAD_REWARD_SCALE
+            moves.append((action, child if alive else None, reward))
+        return moves
+
+    def lookahead_action(self, depth: int = 1) -> int:
+        '''
+        Pick the action with the best backed-up value after simulating depth (1 or 2)
+        moves: the discounted rewards of the moves plus the best Q-value of the state
+        they lead to, all states being evaluated in one batch. Moves where Pacman is
+        caught are worth -inf; if every action is, act greedily on the current state
+        '''
+        ghost_pos = lambda g: [(ghost.location.row, ghost.location.col) for ghost in g.ghosts]
+
+        # For each first action, its reward and its (reward, leaf, discount) continuations
+        leaves: list[GameState] = []
+        leaf_last_pos: list[list[tuple[int, int]]] = []
+        plans = []
+        for action, child, reward in self._simulate_moves(self.state):
+            continuations = []
+            if child is not None and depth == 1:
+                continuations.append((0.0, len(leaves), 1.0))
+                leaves.append(child)
+                leaf_last_pos.append(ghost_pos(self.state))
+            elif child is not None:
+                for _, grandchild, reward2 in self._simulate_moves(child):
+                    if grandchild is not None:
+                        continuations.append((reward2, len(leaves), LOOKAHEAD_DISCOUNT))
+                        leaves.append(grandchild)
+                        leaf_last_pos.append(ghost_pos(child))
+            plans.append((action, reward, continuations))
+
+        best_q = self.evaluate_states(leaves, leaf_last_pos).max(dim=1).values.tolist() if leaves else []
+
+        best_action, best_value = -1, -float('inf')
+        for action, reward, continuations in plans:
+            if not continuations:
+                continue
+            value = reward + LOOKAHEAD_DISCOUNT * max(r + discount * best_q[leaf]
+                                                      for r, leaf, discount in continuations)
+            if value > best_value:
+                best_action, best_value = action, value
+
+        return best_action if best_action >= 0 else self._greedy_action()
+
     # ------------------------------------------------------------------
     # Main async loop (same interface as DecisionModule.decisionLoop)
     #
     # Two modes depending on low_level.connected:
-    #   connected     — act once per server state update (gate on currTicks)
+    #   connected     — act once per server state update, idle in between
     #   not connected — 3 pacbot moves per 2 ghost moves; ghosts move every
-    #                   12 ticks at 24 fps = 0.5 s, so sleep 1/3 s per move
+    #                   12 ticks at 24 fps = 0.5 s, so one move per 1/3 s
+    #                   ('fixed') or per 8 ticks ('ticks'), or once per
+    #                   frame ('frames'), depending on self.pacing
     #
     # Calls send_direction only when the output direction changes.
     # ------------------------------------------------------------------
 
     async def decisionLoop(self) -> None:
-        last_ticks = -1
         last_direction = Directions.NONE
         stuck_pos = None
         stuck_start = None
         unstuck_triggered = False
 
         while self.state.isConnected():
-            if low_level.connected:
-                # Physical robot: act once per server state update
-                await asyncio.sleep(0)
-                if self.state.currTicks == last_ticks:
-                    continue
-                last_ticks = self.state.currTicks
-            else:
-                # Simulation: 3 pacbot moves per 2 ghost moves = 1 move per 1/3 s
-                await asyncio.sleep(1 / 3)
-                last_ticks = self.state.currTicks
+            # Physical robot: once per server frame; simulation: see self.pacing
+            await wait_for_turn(self.state, self.pacing)
+            if not self.state.isConnected():
+                break
 
             if self.state.gameMode == GameModes.PAUSED:
                 continue
@@ -259,7 +415,8 @@ class DQNDecisionModule:
 
             self.state.lock()
 
-            direction = self.get_direction()
+            with latencyStats.span('get_direction'):
+                direction = self.get_direction()
             pacman_pos = (self.state.pacmanLoc.row, self.state.pacmanLoc.col)
 
             if self.log:
@@ -268,6 +425,7 @@ class DQNDecisionModule:
 
             if direction != Directions.NONE:
                 self.state.queueAction(1, direction)
+                latencyStats.record('frame_to_command', perf_counter() - self.state.frameTime)
 
             self.state.unlock()
 
@@ -289,3 +447,7 @@ class DQNDecisionModule:
                 if not self.force_no_bot:
                     send_direction(direction)
                 last_direction = direction
+
+        hits, misses = self.q_cache_stats['hits'], self.q_cache_stats['misses']
+        if hits + misses:
+            print(f'[DQN] Q cache: {hits} hits, {misses} misses ({hits / (hits + misses):.0%} hit rate)')
@@ -0,0 +1,111 @@
+'''
+Export a DQN training checkpoint to a self-contained TorchScript model, which the
+client loads without the curc-pacbot-rl model definitions
+(python pacbotClient.py --strategy dqn --checkpoint <model>), and compare the
+Q-values and latency of exported models with the eager one.
+
+Usage: python export_dqn.py export <checkpoint> <output> [--quantize]
+       python export_dqn.py compare <checkpoint> <exported> [--states N] [--seed S]
+'''
+
+import argparse
+import json
+import random
+from time import perf_counter
+
+import numpy as np
+import torch
+
+from DQNObservation import DQNObservation
+from dqn_module import OBS_SHAPE, load_checkpoint_model, load_q_net
+from LatencyStats import LatencyStats
+from sampleStates import random_state, random_walk
+
+
+def export(checkpoint_path: str, output_path: str, quantize: bool) -> None:
+    '''
+    Trace the checkpoint's model (optionally with its linear layers dynamically
+    quantized to int8), freeze it, and save it with its description
+    '''
+    q_net, info = load_checkpoint_model(checkpoint_path)
+    if quantize:
+        q_net = torch.ao.quantization.quantize_dynamic(q_net, {torch.nn.Linear}, dtype=torch.qint8)
+        info['quantized'] = True
+
+    example = torch.zeros((1, *OBS_SHAPE))
+    with torch.no_grad():
+        exported = torch.jit.freeze(torch.jit.trace(q_net, example))
+    torch.jit.save(exported, output_path, _extra_files={'meta.json': json.dumps(info)})
+    print(f'Exported {info["model"]} (iter={info["iter"]}{", int8" if quantize else ""}) to {output_path}')
+
+
+def observations(count: int, seed: int) -> list[torch.Tensor]:
+    '''
+    Observations of consecutive frames from random mid-game states
+    '''
+    rng = random.Random(seed)
+    builder = None
+    result = []
+    while len(result) < count:
+        frames = random_walk(random_state(rng), rng, 10)
+        builder = builder or DQNObservation(tuple(frames[0].wallArr))
+        lastGhostPos = [(32, 32)] * 4
+        for frame in frames:
+            result.append(torch.from_numpy(builder.build(frame, lastGhostPos).copy()).unsqueeze(0))
+            lastGhostPos = [(ghost.location.row, ghost.location.col) for ghost in frame.ghosts]
+    return result[:count]
+
+
+def compare(checkpoint_path: str, exported_path: str, count: int, seed: int) -> None:
+    '''
+    Evaluate the eager and the exported model on the same observations, one at a
+    time as in the decision loop: Q-value differences, greedy action agreement,
+    and forward pass latency
+    '''
+    eager, _ = load_checkpoint_model(checkpoint_path)
+    exported, info = load_q_net(exported_path, torch.device('cpu'))
+    print(f'{info["model"]} (iter={info["iter"]}{", int8" if info["quantized"] else ""}) '
+          f'on {torch.get_num_threads()} threads')
+
+    obs = observations(count, seed)
+    stats = LatencyStats()
+    qValues = {}
+    with torch.inference_mode():
+        for name, q_net in (('eager', eager), ('exported', exported)):
+            for x in obs[:10]: # warm up (TorchScript optimizes on the first runs)
+                q_net(x)
+            values = []
+            for x in obs:
+                start = perf_counter()
+                values.append(q_net(x))
+                stats.record(f'{name}_forward', perf_counter() - start)
+            qValues[name] = torch.cat(values).numpy()
+
+    diff = np.abs(qValues['eager'] - qValues['exported'])
+    agree = np.mean(qValues['eager'].argmax(axis=1) == qValues['exported'].argmax(axis=1))
+    print(f'{count} observations: max |dQ| = {diff.max():.3g}, mean |dQ| = {diff.mean():.3g}, '
+          f'same greedy action {agree:.1%}')
+    print(stats.summary())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='DQN model export')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    exportParser = commands.add_parser('export', help='Export a checkpoint to TorchScript')
+    exportParser.add_argument('checkpoint', help='Training checkpoint (.pt)')
+    exportParser.add_argument('output', help='Exported model path')
+    exportParser.add_argument('--quantize', action='store_true',
+                              help='Quantize the linear layers to int8 (CPU inference only)')
+
+    compareParser = commands.add_parser('compare', help='Compare an exported model with the checkpoint')
+    compareParser.add_argument('checkpoint', help='Training checkpoint (.pt)')
+    compareParser.add_argument('exported', help='Exported model path')
+    compareParser.add_argument('--states', type=int, default=500, help='Number of observations')
+    compareParser.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args()
+    if args.command == 'export':
+        export(args.checkpoint, args.output, args.quantize)
+    else:
+        compare(args.checkpoint, args.exported, args.states, args.seed)
@@ -2,7 +2,17 @@
 from enum import IntEnum
 
 # Struct class (for processing)
-from struct import unpack_from, pack
+from struct import Struct
+
+# Caching of compiled structs
+from functools import lru_cache
+
+# Preallocated storage for the pellet bitsets
+from array import array
+from sys import byteorder
+
+# Precomputation of the ghost plan table
+import numpy as np
 
 # Internal representation of walls
 from walls import wallArr
@@ -13,6 +23,12 @@ from intersections import intersectionArr
 # Buffer to collect messages to write to the server
 from collections import deque
 
+# Arrival time of the latest frame
+from time import perf_counter
+
+# Waiting for new frames
+import asyncio
+
 # Terminal colors for formatting output text
 from terminalColors import *
 
@@ -28,6 +44,9 @@ class GameModes(IntEnum):
 	SCATTER = 1
 	CHASE   = 2
 
+# Game modes by value, to decode them without constructing an enum every frame
+GameModesByValue: tuple[GameModes, ...] = tuple(GameModes)
+
 # Terminal colors, based on the game mode
 GameModeColors = {
 	GameModes.PAUSED:  DIM,
@@ -62,6 +81,9 @@ class Directions(IntEnum):
 	NONE  = 4
 	RANDOM = 5
 
+# Directions by value, to decode table lookups without constructing an enum
+DirectionsByValue: tuple[Directions, ...] = tuple(Directions)
+
 # Directions:                 U     L     D     R  None
 D_ROW: list[int]        = [  -1,   -0,   +1,   +0,   +0]
 D_COL: list[int]        = [  -0,   -1,   +0,   +1,   +0]
@@ -80,6 +102,9 @@ class Location:
 	Location of an entity in the game engine
 	'''
 
+	# Fixed attributes, so that search code cloning states avoids a dict per entity
+	__slots__ = ('state', 'rowDir', 'row', 'colDir', 'col')
+
 	def __init__(self, state) -> None: # type: ignore
 		'''
 		Construct a new location state object
@@ -192,11 +217,35 @@ class Location:
 
 		return f'({self.row}, {self.col})'
 
+	def copy(self, state) -> 'Location': # type: ignore
+		'''
+		Return a copy of this location, attached to another game state
+		'''
+
+		location = Location.__new__(Location)
+		location.state = state
+		location.copyFrom(self)
+		return location
+
+	def copyFrom(self, other: 'Location') -> None:
+		'''
+		Copy the row, column and directions of another location into this one
+		'''
+
+		self.rowDir = other.rowDir
+		self.row    = other.row
+		self.colDir = other.colDir
+		self.col    = other.col
+
 class Ghost:
 	'''
 	Location and auxiliary info of a ghost in the game engine
 	'''
 
+	# Fixed attributes, so that search code cloning states avoids a dict per entity
+	__slots__ = ('state', 'color', 'location', 'frightSteps', 'trappedSteps',
+		'spawning', 'eaten', 'plannedDirection')
+
 	def __init__(self, color: GhostColors, state) -> None: # type: ignore
 		'''
 		Construct a new ghost state object
@@ -246,6 +295,34 @@ class Ghost:
 
 		return (self.eaten << 7) | (self.trappedSteps)
 
+	def copy(self, state) -> 'Ghost': # type: ignore
+		'''
+		Return a copy of this ghost, attached to another game state
+		'''
+
+		ghost = Ghost.__new__(Ghost)
+		ghost.state = state
+		ghost.color = self.color
+		ghost.location = self.location.copy(state)
+		ghost.frightSteps = self.frightSteps
+		ghost.trappedSteps = self.trappedSteps
+		ghost.spawning = self.spawning
+		ghost.eaten = self.eaten
+		ghost.plannedDirection = self.plannedDirection
+		return ghost
+
+	def copyFrom(self, other: 'Ghost') -> None:
+		'''
+		Copy the location, auxiliary info and plan of another ghost into this one
+		'''
+
+		self.location.copyFrom(other.location)
+		self.frightSteps = other.frightSteps
+		self.trappedSteps = other.trappedSteps
+		self.spawning = other.spawning
+		self.eaten = other.eaten
+		self.plannedDirection = other.plannedDirection
+
 	def isFrightened(self) -> bool:
 		'''
 		Return whether this ghost is frightened
@@ -276,25 +353,11 @@ class Ghost:
 		if self.isFrightened():
 			self.frightSteps -= 1
 
-	def guessPlan(self) -> None:
+	def target(self, nextRow: int, nextCol: int) -> tuple[int, int]:
 		'''
-		Use incomplete knowledge of the current game state to predict where the
-		ghosts might aim at the next step
+		Return the tile this ghost is predicted to aim at, given its next position
 		'''
 
-		# For the same reason as in move(), ignore spawning ghosts during short-
-		# term projections into the future
-		if self.spawning:
-			return
-
-		# If the ghost is at an empty location, ignore it
-		if self.location.row >= 32 or self.location.col >= 32:
-			return
-
-		# Row and column at the next step
-		nextRow: int = self.location.row + self.location.rowDir
-		nextCol: int = self.location.col + self.location.colDir
-
 		# Pacman row and column
 		pacmanRow: int = self.state.pacmanLoc.row
 		pacmanCol: int = self.state.pacmanLoc.col
@@ -320,7 +383,7 @@ class Ghost:
 			# Pink targets the space 4 ahead of Pacman
 			elif self.color == GhostColors.PINK:
 				targetRow = pacmanRow + 4 * pacmanRowDir
-				targetRow = pacmanCol + 4 * pacmanColDir
+				targetCol = pacmanCol + 4 * pacmanColDir
 
 			# Cyan targets the position of red, reflected about the position 2 spaces
 			# ahead of Pacman
@@ -342,13 +405,73 @@ class Ghost:
 			targetRow = SCATTER_ROW[self.color]
 			targetCol = SCATTER_COL[self.color]
 
+		return targetRow, targetCol
+
+	def guessPlan(self) -> None:
+		'''
+		Use incomplete knowledge of the current game state to predict where the
+		ghosts might aim at the next step (with the precomputed plan table; same
+		result as guessPlanScan)
+		'''
+
+		# For the same reason as in move(), ignore spawning ghosts during short-
+		# term projections into the future
+		if self.spawning:
+			return
+
+		# If the ghost is at an empty location, ignore it
+		row: int = self.location.row
+		col: int = self.location.col
+		if row >= 32 or col >= 32:
+			return
+
+		# Row and column at the next step
+		rowDir: int = self.location.rowDir
+		colDir: int = self.location.colDir
+		nextRow: int = row + rowDir
+		nextCol: int = col + colDir
+
+		# Target relative to the next step
+		targetRow, targetCol = self.target(nextRow, nextCol)
+		targetRow -= nextRow
+		targetCol -= nextCol
+
+		# Targets beyond the table's reach (never seen in a real game) are scanned
+		if not (-PLAN_REACH <= targetRow <= PLAN_REACH and -PLAN_REACH <= targetCol <= PLAN_REACH):
+			self.guessPlanScan()
+			return
+
+		# Block of the moves allowed from the next step, then the plan for this target
+		moveBase, planTable = self.state._ghostPlanTable
+		block = moveBase[(((nextRow + PLAN_GRID_OFFSET) * PLAN_GRID_SIZE + nextCol + PLAN_GRID_OFFSET) * 4 +
+			rowDir + 2) * 4 + colDir + 2]
+		if self.frightSteps > 0:
+			block += PLAN_SPAN * PLAN_SPAN
+		self.plannedDirection = DirectionsByValue[planTable[block + targetRow * PLAN_SPAN + targetCol]]
+
+	def guessPlanScan(self) -> None:
+		'''
+		Reference version of guessPlan, scanning every direction for the best move
+		'''
+
+		# Ignore spawning ghosts and ghosts at an empty location, as in guessPlan
+		if self.spawning:
+			return
+		if self.location.row >= 32 or self.location.col >= 32:
+			return
+
+		# Row and column at the next step, and the target
+		nextRow: int = self.location.row + self.location.rowDir
+		nextCol: int = self.location.col + self.location.colDir
+		targetRow, targetCol = self.target(nextRow, nextCol)
+
 		# Calculate the distance squared to the target, for all 4 moves
 		minDist = 0xfffffff
 		maxDist = -1
 		minDir  = Directions.UP
 		maxDir  = Directions.UP
 		for direction in Directions:
-			if direction != Directions.NONE:
+			if direction != Directions.NONE and direction != Directions.RANDOM:
 
 				# Avoid reversals, as ghosts are not typically allowed to reverse
 				if D_ROW[direction] + self.location.rowDir != 0 or \
@@ -373,6 +496,83 @@ class Ghost:
 		# Update the best direction to be the plan
 		self.plannedDirection = minDir if (not self.isFrightened()) else maxDir
 
+@lru_cache(maxsize=None)
+def compileFormat(format: str) -> Struct:
+	'''
+	Compile a struct format string once, shared by all game states
+	'''
+
+	return Struct(format)
+
+def regionMask(rowMin: int, rowMax: int, colMin: int, colMax: int) -> tuple[int, ...]:
+	'''
+	Bitboard (one bitset per row) of a rectangle of tiles, for
+	GameState.pelletsInRegion; bounds are inclusive, and clipped to the maze
+	'''
+
+	rowMin, rowMax = max(rowMin, 0), min(rowMax, 30)
+	colMin, colMax = max(colMin, 0), min(colMax, 27)
+	bits = ((1 << (colMax + 1)) - (1 << colMin)) if colMin <= colMax else 0
+	return tuple(bits if rowMin <= row <= rowMax else 0 for row in range(31))
+
+# Ghost plan table dimensions: ghosts plan from their next step, at most 2 tiles
+# off the grid, towards targets at most PLAN_REACH tiles away from it
+PLAN_GRID_OFFSET = 2
+PLAN_GRID_SIZE = 36
+PLAN_REACH = 72
+PLAN_SPAN = 2 * PLAN_REACH + 1
+
+@lru_cache(maxsize=None)
+def createGhostPlanTable(walls: tuple[int, ...]) -> tuple[list[int], bytes]:
+	'''
+	Precompute the predictions of Ghost.guessPlanScan, for every situation:
+	- moveBase, indexed by (next row, next col, row direction, col direction),
+	  is the offset in planTable of the block for the moves allowed there (not
+	  into a wall, and not reversing)
+	- planTable, indexed by that offset + (frightened, target row, target col),
+	  with the target relative to the next step, is the planned direction
+	'''
+
+	moves = (Directions.UP, Directions.LEFT, Directions.DOWN, Directions.RIGHT)
+
+	# Wall grid with a margin of walls, covering every next step and its neighbors
+	margin = PLAN_GRID_OFFSET + 1
+	wallGrid = np.ones((PLAN_GRID_SIZE + 2, PLAN_GRID_SIZE + 2), dtype=bool)
+	wallGrid[margin:margin + 31, margin:margin + 28] = \
+		[[bool((walls[row] >> col) & 1) for col in range(28)] for row in range(31)]
+
+	# Bitmask of the allowed moves, for every next step and heading
+	rows = np.arange(PLAN_GRID_SIZE)[:, None, None, None] + 1
+	cols = np.arange(PLAN_GRID_SIZE)[None, :, None, None] + 1
+	rowDirs = np.arange(-2, 2)[None, None, :, None]
+	colDirs = np.arange(-2, 2)[None, None, None, :]
+	masks = np.zeros((PLAN_GRID_SIZE, PLAN_GRID_SIZE, 4, 4), dtype=np.int64)
+	for bit, direction in enumerate(moves):
+		notReversal = (D_ROW[direction] + rowDirs != 0) | (D_COL[direction] + colDirs != 0)
+		clear = ~wallGrid[rows + D_ROW[direction], cols + D_COL[direction]]
+		masks |= (notReversal & clear).astype(np.int64) << bit
+	moveBase = (masks * 2 * PLAN_SPAN * PLAN_SPAN + PLAN_REACH * PLAN_SPAN + PLAN_REACH).ravel().tolist()
+
+	# Closest and farthest allowed move to every target, for every set of moves,
+	# with the same tie-breaking as the scan (first minimum, last maximum)
+	targetRows = np.arange(-PLAN_REACH, PLAN_REACH + 1)[:, None]
+	targetCols = np.arange(-PLAN_REACH, PLAN_REACH + 1)[None, :]
+	planTable = np.zeros((16, 2, PLAN_SPAN, PLAN_SPAN), dtype=np.uint8)
+	for mask in range(16):
+		minDist = np.full((PLAN_SPAN, PLAN_SPAN), 0xfffffff)
+		maxDist = np.full((PLAN_SPAN, PLAN_SPAN), -1)
+		for bit, direction in enumerate(moves):
+			if mask & (1 << bit):
+				distSqToTarget = (D_ROW[direction] - targetRows) ** 2 + (D_COL[direction] - targetCols) ** 2
+				isMin = distSqToTarget < minDist
+				isMax = ~isMin & (distSqToTarget >= maxDist)
+				minDist = np.where(isMin, distSqToTarget, minDist)
+				maxDist = np.where(isMax, distSqToTarget, maxDist)
+				planTable[mask, 0][isMin] = direction
+				planTable[mask, 1][isMax] = direction
+
+	return moveBase, planTable.tobytes()
+
 class GameStateCompressed:
 	'''
 	Compressed copy of the game state, for easier storage for path planning.
@@ -480,13 +680,47 @@ class GameState:
 		self.fruitDuration: int = 30
 		self.format += 'BB'
 
-		# 31 * 4 bytes = 31 * (32-bit integer bitset)
-		self.pelletArr: list[int] = [0 for _ in range(31)]
+		# Compiled decoder for everything before the pellets
+		self._headerStruct: Struct = compileFormat(self.format)
+
+		# 31 * 4 bytes = 31 * (32-bit integer bitset), decoded in place
+		self.pelletArr: array[int] = array('I', [0 for _ in range(31)])
 		self.format += (31 * 'I')
+
+		# Compiled struct for the whole serialization
+		self._struct: Struct = compileFormat(self.format)
+
+		# Byte view of the pellet storage, for copying pellets straight from messages
+		self._pelletBytes: memoryview = memoryview(self.pelletArr).cast('B')
+
+		# Whether pelletArr is shared with a clone (copied before the next write)
+		self._pelletsShared: bool = False
+
+		# Number of pellets left, recounted on server updates and decremented as
+		# pellets are collected (use setPellets to replace pelletArr)
+		self.pelletCount: int = 0
+
+		# Precomputed ghost plan predictions for this maze (see Ghost.guessPlan)
+		self._ghostPlanTable: tuple[list[int], bytes] = createGhostPlanTable(tuple(self.wallArr))
   
 		self.resume = resume # do we resume the game whenever pacman loses a life or progresses to the next level
 		self.walkable_cells = None # set of walkable cells (non-wall)
 
+		# Number of changes applied to this state (server updates or simulated
+		# actions), so that derived data can be cached per frame
+		self.frameCount: int = 0
+
+		# perf_counter() time at which the latest server frame was applied
+		self.frameTime: float = 0.0
+
+		# Number of server frames applied, and the last one a waiter has seen
+		self.serverFrames: int = 0
+		self._seenFrame: int = 0
+
+		# Event set on each server frame (created by the first waiter, and
+		# never shared with clones)
+		self._frameEvent: asyncio.Event | None = None
+
 	def lock(self) -> None:
 		'''
 		Lock the game state, to prevent updates
@@ -519,6 +753,10 @@ class GameState:
 		# Update the internal 'connected' state variable
 		self._connected = connected
 
+		# Wake up anyone waiting for a frame, so that they can stop
+		if self._frameEvent is not None:
+			self._frameEvent.set()
+
 	def isConnected(self) -> bool:
 		'''
 		Check if the client attached to the game state is connected
@@ -533,10 +771,7 @@ class GameState:
 		'''
 
 		# Return a serialization with the same format as server updates
-		return pack(
-
-			# Format string
-			self.format,
+		return self._struct.pack(
 
 			# General game info
 			self.currTicks,
@@ -601,13 +836,15 @@ class GameState:
 		if self._locked and not lockOverride:
 			return should_resume
 
-		# Unpack the values based on the format string
-		unpacked: tuple[int, ...] = unpack_from(self.format, serializedState, 0)
+		# Unpack the values before the pellets with the compiled struct
+		unpacked: tuple[int, ...] = self._headerStruct.unpack_from(serializedState, 0)
+		self.frameCount += 1
+		self.frameTime = perf_counter()
 
 		# General game info
 		self.currTicks    = unpacked[0]
 		self.updatePeriod = unpacked[1]
-		self.gameMode     = GameModes(unpacked[2])
+		self.gameMode     = GameModesByValue[unpacked[2]]
 		self.modeSteps    = unpacked[3]
 		self.modeDuration = unpacked[4]
 		self.levelSteps   = unpacked[5]
@@ -647,15 +884,115 @@ class GameState:
 		self.fruitSteps = unpacked[24]
 		self.fruitDuration = unpacked[25]
 
-		# Pellet info
-		self.pelletArr = list[int](unpacked)[26:]
+		# Pellet info: copy the big endian bitsets into the preallocated array
+		if self._pelletsShared or self._pelletBytes.obj is not self.pelletArr: # shared or replaced
+			self.pelletArr = array('I', self.pelletArr)
+			self._pelletBytes = memoryview(self.pelletArr).cast('B')
+			self._pelletsShared = False
+		offset = self._headerStruct.size
+		self._pelletBytes[:] = memoryview(serializedState)[offset:offset + len(self._pelletBytes)]
+		if byteorder == 'little':
+			self.pelletArr.byteswap()
+		self.pelletCount = self.countPellets()
 
 		# Reset our guesses of the planned ghost directions
 		for ghost in self.ghosts:
 			ghost.plannedDirection = Directions.NONE
+
+		# Wake up anyone waiting for a new frame
+		self.serverFrames += 1
+		if self._frameEvent is not None:
+			self._frameEvent.set()
 		
 		return should_resume
 
+	def frameStatus(self, serializedState: bytes) -> tuple[int, int, int]:
+		'''
+		Read the game mode, level and lives from a bytes object from the server,
+		without updating this game state (for frames that are not decoded)
+		'''
+
+		unpacked: tuple[int, ...] = self._headerStruct.unpack_from(serializedState, 0)
+		return unpacked[2], unpacked[7], unpacked[8]
+
+	async def waitForFrame(self) -> None:
+		'''
+		Wait (without polling) until a server frame arrives that has not been
+		waited for yet, or the client disconnects
+		'''
+
+		if self._frameEvent is None:
+			self._frameEvent = asyncio.Event()
+
+		while self.serverFrames == self._seenFrame and self._connected:
+			self._frameEvent.clear()
+			await self._frameEvent.wait()
+		self._seenFrame = self.serverFrames
+
+	async def waitForTicks(self, numTicks: int) -> None:
+		'''
+		Wait until the server has advanced by numTicks ticks (or a new game
+		started), or the client disconnects
+		'''
+
+		startTicks = self.currTicks
+		while self._connected:
+			await self.waitForFrame()
+			if not startTicks <= self.currTicks < startTicks + numTicks:
+				return
+
+	def clone(self) -> 'GameState':
+		'''
+		Return an independent copy of this game state, for lookahead search.
+		The maze data is shared, and so are the pellets until either copy
+		changes them (copy-on-write); the clone is unlocked and has an empty
+		message buffer, so simulating on it never affects this state
+		'''
+
+		clone = self.__class__.__new__(self.__class__)
+		clone.__dict__.update(self.__dict__)
+		clone._locked = False
+		clone._frameEvent = None
+		clone.writeServerBuf = deque(maxlen=64)
+
+		# Entities are mutable, so they get their own copies
+		clone.ghosts = [ghost.copy(clone) for ghost in self.ghosts]
+		clone.pacmanLoc = self.pacmanLoc.copy(clone)
+		clone.fruitLoc = self.fruitLoc.copy(clone)
+
+		# Share the pellets until the next write on either side
+		self._pelletsShared = clone._pelletsShared = True
+
+		return clone
+
+	def restore(self, snapshot: 'GameState') -> None:
+		'''
+		Reset this game state, in place, to a clone taken earlier (e.g. to
+		replay another branch of a search from the same root). This state keeps
+		its own entity objects, lock, connection status and message buffer
+		'''
+
+		for name, value in snapshot.__dict__.items():
+			if name not in GameState._RESTORE_SKIP:
+				self.__dict__[name] = value
+
+		for ghost, other in zip(self.ghosts, snapshot.ghosts):
+			ghost.copyFrom(other)
+		self.pacmanLoc.copyFrom(snapshot.pacmanLoc)
+		self.fruitLoc.copyFrom(snapshot.fruitLoc)
+
+		# Share the pellets until the next write on either side
+		self._pelletsShared = snapshot._pelletsShared = True
+
+		# This state has changed
+		self.frameCount += 1
+
+	# Attributes that restore() does not take from the snapshot
+	_RESTORE_SKIP = frozenset({
+		'ghosts', 'pacmanLoc', 'fruitLoc', 'writeServerBuf', '_locked', '_connected', '_pelletBytes',
+		'frameCount', 'serverFrames', '_seenFrame', '_frameEvent'
+	})
+
 	def updateGhostPlans(self, ghostPlans: dict[GhostColors, Directions]):
 		'''
 		Update this game state, given a list of ghost planned directions
@@ -690,11 +1027,75 @@ class GameState:
 
 	def numPellets(self) -> int:
 		'''
-		Helper function to compute how many pellets are left in the maze
+		Helper function to return how many pellets are left in the maze
+		'''
+
+		return self.pelletCount
+
+	def countPellets(self) -> int:
+		'''
+		Helper function to count the pellets left in the maze, row by row
 		'''
 
 		return sum(row_arr.bit_count() for row_arr in self.pelletArr)
 
+	def setPellets(self, pelletArr: list[int]) -> None:
+		'''
+		Helper function to replace the pellets (one 32-bit bitset per row),
+		keeping the pellet count in sync
+		'''
+
+		self.pelletArr = array('I', pelletArr)
+		self._pelletsShared = False
+		self.pelletCount = self.countPellets()
+
+	def pelletsInRegion(self, regionMask: tuple[int, ...]) -> int:
+		'''
+		Helper function to count the pellets within a region (see regionMask)
+		'''
+
+		return sum((row_arr & mask).bit_count() for row_arr, mask in zip(self.pelletArr, regionMask))
+
+	def nearestPelletAlong(self, row: int, col: int, direction: Directions) -> int:
+		'''
+		Helper function to find the nearest pellet in a straight line from a
+		location, before the first wall
+
+		Returns: the number of steps to the pellet, or -1 if there is none
+		'''
+
+		# Only start from locations on the grid
+		if row < 0 or row >= 31 or col < 0 or col >= 28:
+			return -1
+
+		# Horizontal corridors: compare the lowest (or highest) pellet and wall bits
+		if direction == Directions.RIGHT or direction == Directions.LEFT:
+			pellets = self.pelletArr[row]
+			walls = self.wallArr[row] | (~0 << 28)
+			if direction == Directions.RIGHT:
+				pellets >>= col + 1
+				walls >>= col + 1
+				firstPellet = (pellets & -pellets).bit_length()
+				firstWall = (walls & -walls).bit_length()
+				return firstPellet if 0 < firstPellet < firstWall else -1
+			below = (1 << col) - 1
+			lastPellet = (pellets & below).bit_length()
+			lastWall = (walls & below).bit_length()
+			return col + 1 - lastPellet if lastPellet > lastWall else -1
+
+		# Vertical corridors: step through the rows of this column
+		if direction == Directions.UP or direction == Directions.DOWN:
+			step = D_ROW[direction]
+			bit = 1 << col
+			for distance in range(1, 32):
+				row += step
+				if self.wallAt(row, col):
+					break
+				if self.pelletArr[row] & bit:
+					return distance
+
+		return -1
+
 	def collectFruit(self, row: int, col: int) -> None:
 		'''
 		Helper function to collect a fruit for simulation purposes
@@ -728,14 +1129,20 @@ class GameState:
 		# Determine the type of pellet (super / normal)
 		superPellet: bool = self.superPelletAt(row, col)
 
-		# Remove the pellet at this location
+		# Remove the pellet at this location (copying the pellets first if shared)
+		if self._pelletsShared:
+			self.pelletArr = array('I', self.pelletArr)
+			self._pelletsShared = False
 		self.pelletArr[row] &= (~(1 << col))
 
 		# Increase the score by this amount
 		self.currScore += (50 if superPellet else 10)
 
+		# Update the pellet count
+		self.pelletCount -= 1
+
 		# Spawn the fruit based on the number of pellets, if applicable
-		numPellets = self.numPellets()
+		numPellets = self.pelletCount
 		if numPellets == 174 or numPellets == 74:
 			self.fruitSteps = 30
 			self.fruitLoc.row = 17
@@ -884,6 +1291,9 @@ class GameState:
 		of colliding with non-frightened ghosts.
 		'''
 
+		# This state is about to change
+		self.frameCount += 1
+
 		# Try to plan the ghost directions if we expect them to be none
 		for ghost in self.ghosts:
 			if ghost.plannedDirection == Directions.NONE:
@@ -54,3 +54,20 @@ async def unstuck(state, stuck_pos: tuple) -> None:
         send_direction(direction)
         await asyncio.sleep(0.2)
 
+
+# Pacing policies for the decision loops in simulation (no robot connected)
+PACING_POLICIES = ('fixed', 'ticks', 'frames')
+
+async def wait_for_turn(state, pacing: str = 'fixed') -> None:
+    '''
+    Wait until the decision loop should make its next move, without polling:
+      robot connected, or 'frames' — on each new server frame
+      'ticks' — 3 pacbot moves per 2 ghost moves, counted in server ticks
+      'fixed' — 3 pacbot moves per 2 ghost moves at 24 fps: every 1/3 s
+    '''
+    if connected or pacing == 'frames':
+        await state.waitForFrame()
+    elif pacing == 'ticks':
+        await state.waitForTicks(2 * state.updatePeriod // 3)
+    else:
+        await asyncio.sleep(1 / 3)
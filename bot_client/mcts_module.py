@@ -0,0 +1,464 @@
+import gc
+import json
+import math
+import os
+import random
+from time import perf_counter, time
+
+import numpy as np
+
+from gameState import GameState, GameModes, Directions, D_ROW, D_COL
+from BatchSimulator import BatchSimulator, DIR_ROW, DIR_COL
+from DistMatrix import RoutingTable, UNREACHABLE
+from MazeIndex import NEIGHBOR_DIRECTIONS
+from low_level import send_direction, unstuck, wait_for_turn
+from LatencyStats import latencyStats
+
+# Moves considered at every node (staying still is never expanded)
+MOVES = NEIGHBOR_DIRECTIONS
+
+# Ticks simulated per Pacman move: ghosts move every 12 ticks, and Pacbot makes
+# 3 moves per 2 ghost moves
+TICKS_PER_MOVE = 8
+
+# Search tuning (values are in game points)
+DEATH_PENALTY = 500           # value of getting caught by a ghost
+DISCOUNT = 0.95               # per-move discount, so that earlier points are preferred
+EXPLORATION = 50.0            # UCT exploration constant
+PELLET_DISTANCE_WEIGHT = 2.0  # penalty per tile to the nearest pellet at the end of a rollout
+
+# Default search time per decision, as a fraction of the server's frame period
+# (GameFPS in config.json), so that the decision is made before the next update
+BUDGET_FRACTION = 0.6
+
+# Fraction of the budget kept at the end of a search using workers, to collect
+# and merge their results
+POOL_MARGIN = 0.1
+
+# Time allowed for the workers' results to come back: the workers stop this long
+# before the tree search does
+GATHER_GRACE = 0.002
+
+# Print a nodes/second summary every this many decisions
+REPORT_EVERY = 100
+
+
+def default_budget_ms() -> float:
+    '''
+    Default search time per decision: BUDGET_FRACTION of a server frame period
+    '''
+    configPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config.json')
+    with open(configPath, 'r', encoding='UTF-8') as configFile:
+        config = json.load(configFile)
+    return BUDGET_FRACTION * 1000 / config['GameFPS']
+
+
+def legal_moves(g: GameState) -> list[Directions]:
+    '''
+    Moves that do not run Pacman into a wall
+    '''
+    row, col = g.pacmanLoc.row, g.pacmanLoc.col
+    return [d for d in MOVES if not g.wallAt(row + D_ROW[d], col + D_COL[d])]
+
+
+def random_move(g: GameState, rng: random.Random) -> Directions:
+    '''
+    Rollout policy: a random legal move, avoiding reversals unless at a dead end
+    '''
+    moves = legal_moves(g)
+    rowDir, colDir = g.pacmanLoc.rowDir, g.pacmanLoc.colDir
+    forward = [d for d in moves if D_ROW[d] != -rowDir or D_COL[d] != -colDir]
+    return rng.choice(forward or moves or [Directions.NONE])
+
+
+def nearest_pellet(routes: RoutingTable, rows, cols, pelletArr) -> np.ndarray:
+    '''
+    Maze distance from each (row, col) to the nearest remaining pellet (0 if none left);
+    pelletArr holds one pellet bitset per row, with one leading axis per position
+    '''
+    maze = routes.maze
+    ids = maze.id_grid[rows, cols]
+    pellets = (np.asarray(pelletArr, dtype=np.int64)[..., maze.rows] >> maze.cols) & 1
+    dist = np.where(pellets == 1, routes.distTable[ids], UNREACHABLE)
+    return np.where(pellets.any(axis=-1), dist.min(axis=-1), 0)
+
+
+def rollout(g: GameState, depth: int, routes: RoutingTable, rng: random.Random,
+            deadline: float = math.inf) -> tuple[float, int]:
+    '''
+    Play random moves from g (left untouched) and score the outcome: the discounted
+    points gained, minus the death penalty if Pacman is caught, or else minus the
+    distance to the nearest pellet at the end. Stops early (after at least one move)
+    once perf_counter() reaches the deadline
+    @return:
+        - float, the value of the rollout
+        - int, the number of moves simulated
+    '''
+    g = g.clone()
+    value, discount = 0.0, 1.0
+    step = 0
+    for step in range(1, depth + 1):
+        score = g.currScore
+        safe = g.simulateAction(TICKS_PER_MOVE, random_move(g, rng))
+        value += discount * (g.currScore - score)
+        if not safe:
+            return value - discount * DEATH_PENALTY, step
+        discount *= DISCOUNT
+        if g.numPellets() == 0:
+            return value, step
+        if perf_counter() >= deadline:
+            break
+
+    return value - discount * PELLET_DISTANCE_WEIGHT * \
+        float(nearest_pellet(routes, g.pacmanLoc.row, g.pacmanLoc.col, g.pelletArr)), step
+
+
+class _Node:
+    '''
+    Search tree node: the predicted game state after taking `action` from the parent
+    '''
+
+    __slots__ = ('state', 'action', 'parent', 'children', 'untried', 'alive',
+                 'reward', 'visits', 'total')
+
+    def __init__(self, state: GameState, action: Directions, parent, alive: bool, reward: float) -> None:
+        self.state = state
+        self.action = action
+        self.parent = parent
+        self.children: dict[Directions, '_Node'] = {}
+        self.untried: list[Directions] | None = None  # legal moves, filled in on the first visit
+        self.alive = alive
+        self.reward = reward  # score gained on the edge from the parent
+        self.visits = 0
+        self.total = 0.0
+
+    def mean(self) -> float:
+        return self.total / self.visits if self.visits else 0.0
+
+
+class MCTSDecisionModule:
+    '''
+    Decision module that runs a Monte Carlo tree search over Pacman's moves,
+    scoring leaves with random GameState.simulateAction rollouts.
+    Drop-in replacement for DecisionModule — exposes the same decisionLoop().
+    '''
+
+    def __init__(self, state: GameState, log: bool = False, budget_ms: float | None = None,
+                 rollout_depth: int = 10, rollouts_per_leaf: int = 1, workers: int = 0,
+                 force_no_bot: bool = False, pacing: str = 'fixed', pool=None) -> None:
+        self.state = state
+        self.log = log
+        self.force_no_bot = force_no_bot
+        # Decision pacing in simulation (see low_level.wait_for_turn)
+        self.pacing = pacing
+
+        # Hard limit on the search time of one decision (by default, a fraction
+        # of a frame period: the search blocks the event loop while it runs)
+        self.budget = (budget_ms if budget_ms is not None else default_budget_ms()) / 1000
+
+        # perf_counter() time at which the current search must stop its rollouts
+        self._deadline = math.inf
+
+        # Moves per rollout, and rollouts per leaf (run as BatchSimulator lanes if > 1)
+        self.rollout_depth = rollout_depth
+        self.rollouts_per_leaf = rollouts_per_leaf
+
+        # Worker processes running extra rollouts for the first moves, if any: a
+        # RolloutPool started by the caller (the client forks it before opening any
+        # socket or event loop), or one started here; shut down by decisionLoop
+        self.pool = pool
+        if self.pool is None and workers > 0:
+            from RolloutPool import RolloutPool
+            self.pool = RolloutPool(workers, rollout_depth)
+        if self.pool is not None:
+            print(f'[MCTS] Using {self.pool.workers} rollout workers')
+
+        self.routes = RoutingTable(state)
+        self.maze = self.routes.maze
+        self._rng = random.Random()
+        self._np_rng = np.random.default_rng()
+
+        # Tree of the previous decision, and the move chosen from its root
+        self._root: _Node | None = None
+        self._chosen: Directions | None = None
+
+        self.stats = {'decisions': 0, 'iterations': 0, 'nodes': 0, 'steps': 0,
+                      'reused': 0, 'search_time': 0.0}
+
+    # ------------------------------------------------------------------
+    # Rollout policy and leaf evaluation
+    # ------------------------------------------------------------------
+
+    def _rollout(self, g: GameState) -> float:
+        value, steps = rollout(g, self.rollout_depth, self.routes, self._rng, self._deadline)
+        self.stats['steps'] += steps
+        return value
+
+    def _batch_rollout(self, g: GameState) -> float:
+        '''
+        Same as _rollout, averaged over rollouts_per_leaf lanes simulated together
+        '''
+        lanes = self.rollouts_per_leaf
+        sim = BatchSimulator([g] * lanes)
+        value = np.zeros(lanes)
+        discount = 1.0
+        for _ in range(self.rollout_depth):
+            # Random legal moves, avoiding reversals unless at a dead end
+            ids = self.maze.id_grid[sim.pacmanRow, sim.pacmanCol]
+            legal = self.maze.neighbors[ids] >= 0
+            forward = legal & ((DIR_ROW[:4] != -sim.pacmanRowDir[:, None]) |
+                               (DIR_COL[:4] != -sim.pacmanColDir[:, None]))
+            choices = np.where(forward.any(axis=1)[:, None], forward, legal)
+            moves = (self._np_rng.random((lanes, 4)) * choices).argmax(axis=1)
+
+            wasAlive = sim.alive.copy()
+            _, gained = sim.simulateAction(TICKS_PER_MOVE, moves)
+            self.stats['steps'] += int(wasAlive.sum())
+            value += discount * gained
+            value[wasAlive & ~sim.alive] -= discount * DEATH_PENALTY
+            discount *= DISCOUNT
+            if not sim.alive.any() or perf_counter() >= self._deadline:
+                break
+
+        nearest = nearest_pellet(self.routes, sim.pacmanRow, sim.pacmanCol, sim.pelletArr)
+        value[sim.alive] -= discount * PELLET_DISTANCE_WEIGHT * nearest[sim.alive]
+        return float(value.mean())
+
+    # ------------------------------------------------------------------
+    # Tree search
+    # ------------------------------------------------------------------
+
+    def _expand(self, node: _Node) -> _Node:
+        action = node.untried.pop()
+        state = node.state.clone()
+        score = state.currScore
+        alive = state.simulateAction(TICKS_PER_MOVE, action)
+        reward = state.currScore - score - (0 if alive else DEATH_PENALTY)
+        child = _Node(state, action, node, alive, reward)
+        node.children[action] = child
+        self.stats['nodes'] += 1
+        return child
+
+    def _select(self, node: _Node) -> _Node:
+        logVisits = math.log(node.visits)
+        return max(node.children.values(),
+                   key=lambda child: child.mean() + EXPLORATION * math.sqrt(logVisits / child.visits))
+
+    def _iterate(self, root: _Node) -> None:
+        # Selection: descend through fully expanded nodes
+        node = root
+        while True:
+            if node.untried is None:
+                node.untried = legal_moves(node.state)
+                self._rng.shuffle(node.untried)
+            if node.untried or not node.children or not node.alive:
+                break
+            node = self._select(node)
+
+        # Expansion and evaluation
+        value = 0.0
+        if node.alive and node.untried:
+            node = self._expand(node)
+        if node.alive:
+            value = self._rollout(node.state) if self.rollouts_per_leaf <= 1 else self._batch_rollout(node.state)
+
+        # Backpropagation: each node accumulates the discounted return from its
+        # parent's point of view, starting with the reward of its own edge
+        while node is not None:
+            value = node.reward + DISCOUNT * value
+            node.visits += 1
+            node.total += value
+            node = node.parent
+
+    def _state_key(self, g: GameState) -> tuple:
+        return (g.pacmanLoc.row, g.pacmanLoc.col,
+                tuple((ghost.location.row, ghost.location.col) for ghost in g.ghosts),
+                g.numPellets())
+
+    def _reuse_root(self) -> _Node | None:
+        '''
+        Return the subtree of the previous search matching the current state, if any:
+        the child of the chosen move once Pacman has made it, or the old root before that
+        '''
+        if self._root is None:
+            return None
+        key = self._state_key(self.state)
+        for node in (self._root.children.get(self._chosen), self._root):
+            if node is not None and node.alive and self._state_key(node.state) == key:
+                node.parent = None
+                node.reward = 0
+                node.state = self.state.clone()
+                return node
+        return None
+
+    def search(self) -> Directions:
+        '''
+        Search from the current state until the time budget runs out, and return
+        the most visited move
+        '''
+        # The search allocates many short-lived objects, and a garbage collection
+        # pass can take several milliseconds: postpone them until after the decision
+        gcEnabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self._search()
+        finally:
+            if gcEnabled:
+                gc.enable()
+
+    def _search(self) -> Directions:
+        start = perf_counter()
+        deadline = start + self.budget
+
+        # With workers, the tree search stops early to leave time for merging their
+        # results; they stop earlier still, so that their results are back by then
+        self._deadline = deadline - (self.budget * POOL_MARGIN if self.pool is not None else 0)
+
+        root = self._reuse_root()
+        if root is not None:
+            self.stats['reused'] += 1
+        else:
+            root = _Node(self.state.clone(), Directions.NONE, None, True, 0)
+        nodes, steps = self.stats['nodes'], self.stats['steps']
+
+        # Let the workers evaluate the first moves in the meantime
+        if self.pool is not None:
+            poolDeadline = time() + (self._deadline - perf_counter()) - GATHER_GRACE
+            futures = self.pool.submit(self.state, legal_moves(self.state), poolDeadline)
+
+        iterations = 0
+        while True:
+            self._iterate(root)
+            iterations += 1
+            if perf_counter() >= self._deadline:
+                break
+
+        # Merge the workers' rollouts into the first-move statistics (gather only
+        # waits until poolDeadline + GATHER_GRACE, that is until self._deadline)
+        if self.pool is not None:
+            results = self.pool.gather(futures, poolDeadline)
+            if results:
+                while root.untried:
+                    self._expand(root)
+                for move, (total, count) in results.items():
+                    child = root.children[move]
+                    child.visits += count
+                    child.total += total
+                    root.visits += count
+                    root.total += total
+
+        # Robust child: the most visited move, ties broken by the mean value
+        direction = Directions.NONE
+        if root.children:
+            best = max(root.children.values(), key=lambda child: (child.visits, child.mean()))
+            direction = best.action
+        self._root, self._chosen = root, direction
+
+        elapsed = perf_counter() - start
+        self.stats['decisions'] += 1
+        self.stats['iterations'] += iterations
+        self.stats['search_time'] += elapsed
+        if self.log:
+            print(f'[MCTS] {iterations} iterations, {self.stats["nodes"] - nodes} nodes, '
+                  f'{self.stats["steps"] - steps} rollout steps in {elapsed * 1000:.1f} ms '
+                  f'(root visits {root.visits})')
+        if self.stats['decisions'] % REPORT_EVERY == 0:
+            self.report()
+
+        return direction
+
+    def report(self) -> None:
+        '''
+        Print the search throughput so far
+        '''
+        s = self.stats
+        if s['search_time'] == 0:
+            return
+        print(f'[MCTS] {s["decisions"]} decisions: {s["nodes"] / s["search_time"]:,.0f} nodes/s, '
+              f'{s["steps"] / s["search_time"]:,.0f} rollout steps/s, '
+              f'{s["iterations"] / s["decisions"]:.0f} iterations/decision, '
+              f'{s["reused"] / s["decisions"]:.0%} subtrees reused')
+        if self.pool is not None:
+            p = self.pool.stats
+            print(f'[MCTS] workers: {p["rollouts"] / s["search_time"]:,.0f} rollouts/s, '
+                  f'{p["steps"] / s["search_time"]:,.0f} rollout steps/s, '
+                  f'{p["dropped"]}/{p["tasks"]} tasks dropped')
+
+    def get_direction(self) -> Directions:
+        row, col = self.state.pacmanLoc.row, self.state.pacmanLoc.col
+        if self.maze.id_of(row, col) < 0:
+            return Directions.NONE
+        return self.search()
+
+    # ------------------------------------------------------------------
+    # Main async loop (same interface as DecisionModule.decisionLoop)
+    #
+    # Two modes depending on low_level.connected:
+    #   connected     — act once per server state update, idle in between
+    #   not connected — 3 pacbot moves per 2 ghost moves; ghosts move every
+    #                   12 ticks at 24 fps = 0.5 s, so one move per 1/3 s
+    #                   ('fixed') or per 8 ticks ('ticks'), or once per
+    #                   frame ('frames'), depending on self.pacing
+    #
+    # Calls send_direction only when the output direction changes.
+    # ------------------------------------------------------------------
+
+    async def decisionLoop(self) -> None:
+        last_direction = Directions.NONE
+        stuck_pos = None
+        stuck_start = None
+        unstuck_triggered = False
+
+        try:
+            while self.state.isConnected():
+                # Physical robot: once per server frame; simulation: see self.pacing
+                await wait_for_turn(self.state, self.pacing)
+                if not self.state.isConnected():
+                    break
+
+                if self.state.gameMode == GameModes.PAUSED:
+                    continue
+
+                if len(self.state.writeServerBuf):
+                    continue
+
+                self.state.lock()
+
+                with latencyStats.span('get_direction'):
+                    direction = self.get_direction()
+                pacman_pos = (self.state.pacmanLoc.row, self.state.pacmanLoc.col)
+
+                if self.log:
+                    print(f'[MCTS] pos=({self.state.pacmanLoc.row},{self.state.pacmanLoc.col}) '
+                          f'dir={direction.name}')
+
+                if direction != Directions.NONE:
+                    self.state.queueAction(1, direction)
+                    latencyStats.record('frame_to_command', perf_counter() - self.state.frameTime)
+
+                self.state.unlock()
+
+                if direction != Directions.NONE:
+                    if pacman_pos != stuck_pos:
+                        unstuck_triggered = False
+                        stuck_pos = pacman_pos
+                        stuck_start = time()
+                    elif not unstuck_triggered and (time() - stuck_start) >= 2.0:
+                        unstuck_triggered = True
+                        if not self.force_no_bot:
+                            await unstuck(self.state, stuck_pos)
+                else:
+                    stuck_pos = None
+                    stuck_start = None
+                    unstuck_triggered = False
+
+                if direction != last_direction:
+                    if not self.force_no_bot:
+                        send_direction(direction)
+                    last_direction = direction
+        finally:
+            # Final throughput, then stop the workers (waiting for them, so that
+            # none is left running while the interpreter exits)
+            self.report()
+            if self.pool is not None:
+                self.pool.shutdown()
@@ -1,21 +1,42 @@
+# Startup time report (from here to being connected to the server)
+from time import perf_counter
+startupMark: float = perf_counter()
+startupStages: list[tuple[str, float]] = []
+
+def markStartup(stage: str) -> None:
+	'''
+	Record the time taken by a startup stage, since the previous one
+	'''
+	global startupMark
+	now = perf_counter()
+	startupStages.append((stage, now - startupMark))
+	startupMark = now
+
 # JSON (for reading config.json)
 import json
 import os
 
+# Importing the decision modules on demand
+import importlib
+
 # Asyncio (for concurrency)
 import asyncio
 
 # Websockets (for communication with the server)
-from websockets.sync.client import connect, ClientConnection # type: ignore
-from websockets.exceptions import ConnectionClosedError # type: ignore
+from websockets.client import connect, WebSocketClientProtocol # type: ignore
+from websockets.exceptions import ConnectionClosed # type: ignore
 from websockets.typing import Data # type: ignore
 
 # Game state
 from gameState import GameState
 
-# Decision modules
-from decisionModule import DecisionModule
-from dqn_module import DQNDecisionModule
+# Decision modules by strategy: (module, class), imported on demand so that
+# a strategy never pays for the dependencies of another (e.g. torch for dqn)
+STRATEGIES: dict[str, tuple[str, str]] = {
+	'astar': ('decisionModule', 'DecisionModule'),
+	'dqn': ('dqn_module', 'DQNDecisionModule'),
+	'mcts': ('mcts_module', 'MCTSDecisionModule'),
+}
 
 # Server messages
 from serverMessage import *
@@ -27,10 +48,18 @@ signal.signal(signal.SIGINT, signal.SIG_DFL)
 # Terminal colors for formatting output text
 from terminalColors import *
 
+# Server frames queued before the client stops reading from the connection
+# (the same as the websockets receive buffer)
+MAX_QUEUED_FRAMES = 32
+
 # Debug server
 from debugServer import DebugServer
 
-from pathfinding import find_path
+# Frame-to-command latency
+from LatencyStats import latencyStats
+
+# Decision pacing policies
+from low_level import PACING_POLICIES
 
 #from RPi.GPIO import GPIO
 
@@ -70,20 +99,40 @@ class PacbotClient:
 		# Private variable to store whether the socket is open
 		self._socketOpen: bool = False
 
-		# Connection object to communicate with the server
-		self.connection: ClientConnection
+		# Connection object to communicate with the server (asyncio-based, so
+		# that waiting for a frame does not block the decision loop)
+		self.connection: WebSocketClientProtocol
 
 		# Game state object to store the game information
 		self.state: GameState = GameState(False if (args.games == 1 or args.competition_mode) else True)
 
+		markStartup('setup')
+
 		# Decision module (policy) to make high-level decisions
+		moduleName, className = STRATEGIES[args.strategy]
+		decisionModuleClass = getattr(importlib.import_module(moduleName), className)
+		markStartup(f'import {moduleName}')
 		if args.strategy == 'dqn':
-			self.decisionModule = DQNDecisionModule(self.state, args.checkpoint, args.debug,
-			                                        hybrid_mode=args.hybrid_mode,
-			                                        force_no_bot=args.force_no_bot)
+			self.decisionModule = decisionModuleClass(self.state, args.checkpoint, args.debug,
+			                                          hybrid_mode=args.hybrid_mode,
+			                                          force_no_bot=args.force_no_bot,
+			                                          pacing=args.sim_pacing,
+			                                          num_threads=args.torch_threads,
+			                                          lookahead=args.dqn_lookahead,
+			                                          cache_size=args.dqn_cache_size)
+		elif args.strategy == 'mcts':
+			self.decisionModule = decisionModuleClass(self.state, args.debug,
+			                                          budget_ms=args.mcts_budget_ms,
+			                                          rollout_depth=args.mcts_depth,
+			                                          rollouts_per_leaf=args.mcts_rollouts,
+			                                          force_no_bot=args.force_no_bot,
+			                                          pacing=args.sim_pacing,
+			                                          pool=rolloutPool)
 		else:
-			self.decisionModule: DecisionModule = DecisionModule(self.state, args.debug,
-			                                                     force_no_bot=args.force_no_bot)
+			self.decisionModule = decisionModuleClass(self.state, args.debug,
+			                                          force_no_bot=args.force_no_bot,
+			                                          pacing=args.sim_pacing)
+		markStartup(f'create {className}')
   
 		# list of scores for each game
 		self.scores = []
@@ -91,6 +140,17 @@ class PacbotClient:
 		# timestamp of last game over
 		self.last_game_over_time = time()
 
+		# Whether the latency summary was printed with the final scores
+		self.latencyReported: bool = False
+
+		# Server frames received, and those dropped for a newer one (--coalesce_frames)
+		self.framesReceived: int = 0
+		self.framesSkipped: int = 0
+
+		# Frames received but not handled yet, filled by readLoop (ending with the
+		# ConnectionClosed exception), so that the newest queued frame can be found
+		self.frames: asyncio.Queue[bytes | ConnectionClosed] = asyncio.Queue(MAX_QUEUED_FRAMES)
+
 	async def run(self) -> None:
 		'''
 		Connect to the server, then run
@@ -98,15 +158,24 @@ class PacbotClient:
 
 		# Connect to the websocket server
 		await self.connect()
+		markStartup('connect')
+		print('[Startup] ' + ', '.join(f'{stage}: {seconds * 1e3:.0f} ms' for stage, seconds in startupStages) +
+		      f' (total {sum(seconds for _, seconds in startupStages) * 1e3:.0f} ms)')
 
+		reader = None
 		try: # Try receiving messages indefinitely
 			if self._socketOpen:
+				reader = asyncio.create_task(self.readLoop())
 				await asyncio.gather(
 					self.receiveLoop(),
 					self.decisionModule.decisionLoop()
 				)
 		finally: # Disconnect once the connection is over
+			if reader is not None:
+				reader.cancel()
 			await self.disconnect()
+			if not self.latencyReported and any(latencyStats.samples.values()):
+				print(f'{GREEN}Latency:\n{latencyStats.summary()}{NORMAL}')
 
 	async def connect(self) -> None:
 		'''
@@ -115,7 +184,7 @@ class PacbotClient:
 
 		# Connect to the specified URL
 		try:
-			self.connection = connect(self.connectURL)
+			self.connection = await connect(self.connectURL)
 			self._socketOpen = True
 			self.state.setConnectionStatus(True)
 
@@ -135,7 +204,7 @@ class PacbotClient:
 
 		# Close the connection
 		if self._socketOpen:
-			self.connection.close()
+			await self.connection.close()
 		self._socketOpen = False
 		self.state.setConnectionStatus(False)
 
@@ -146,19 +215,27 @@ class PacbotClient:
 		'''
 		return self._socketOpen
 
-	async def receiveLoop(self) -> None:
+	async def tickWriteBuffer(self) -> None:
 		'''
-		Receive loop for capturing messages from the server
+		Count down the next queued message by one server frame, and send it
+		to the server once it is due
 		'''
 
-		# Receive values as long as the connection is open
-		while self.isOpen():
+		if self.state.writeServerBuf and self.state.writeServerBuf[0].tick():
+			response: bytes = self.state.writeServerBuf.popleft().getBytes()
+			if not args.competition_mode:
+				await self.connection.send(response)
 
-			# Try to receive messages (and skip to except in case of an error)
-			try:
+	async def readLoop(self) -> None:
+		'''
+		Reader task: queue the messages from the server as they arrive
+		'''
 
+		try:
+			while True:
 				# Receive a message from the connection
-				message: Data = self.connection.recv()
+				message: Data = await self.connection.recv()
+				self.framesReceived += 1
 
 				# Convert the message to bytes, if necessary
 				messageBytes: bytes
@@ -166,6 +243,49 @@ class PacbotClient:
 					messageBytes = message # type: ignore
 				else:
 					messageBytes = message.encode('ascii') # type: ignore
+				await self.frames.put(messageBytes)
+
+		# Hand the closed connection to the receive loop, after the last frame
+		except ConnectionClosed as e:
+			await self.frames.put(e)
+
+	async def receiveLoop(self) -> None:
+		'''
+		Receive loop for capturing messages from the server
+		'''
+
+		# Frame taken from the queue while coalescing, but to be handled on its own
+		nextMessage: bytes | ConnectionClosed | None = None
+
+		# Receive values as long as the connection is open
+		while self.isOpen():
+
+			# Wait for the next message from the connection
+			messageBytes = nextMessage if nextMessage is not None else await self.frames.get()
+			nextMessage = None
+
+			# Try to handle messages (and skip to except in case of an error)
+			try:
+
+				# Break once the connection is closed
+				if isinstance(messageBytes, ConnectionClosed):
+					raise messageBytes
+
+				# Latest frame wins: if more frames queued up meanwhile (e.g. during
+				# a long decision), skip to the newest instead of replaying them. A
+				# frame is only skipped for a newer one with the same game mode, level
+				# and lives, so the game over and resume checks below give the same
+				# result for both; the first frame that differs is handled on its own
+				if args.coalesce_frames:
+					status = self.state.frameStatus(messageBytes)
+					while not self.frames.empty():
+						newer = self.frames.get_nowait()
+						if isinstance(newer, ConnectionClosed) or self.state.frameStatus(newer) != status:
+							nextMessage = newer
+							break
+						await self.tickWriteBuffer() # for the skipped frame
+						messageBytes = newer
+						self.framesSkipped += 1
 
 				# Update the state, given this message from the server
 				should_resume = self.state.update(messageBytes)
@@ -180,9 +300,15 @@ class PacbotClient:
 						if len(self.scores) > 1:
 							print(f'{GREEN}Average score: {int(np.mean(self.scores))}{NORMAL}')
 							print(f'{GREEN}Standard deviation: {int(np.std(self.scores))}{NORMAL}')
+						print(f'{GREEN}Frames skipped: {self.framesSkipped}/{self.framesReceived}{NORMAL}')
+						print(f'{GREEN}Latency:\n{latencyStats.summary()}{NORMAL}')
+						self.latencyReported = True
 						if args.output:
 							with open(args.output, 'w') as f:
 								f.write(str(self.scores))
+							if latencyStats.enabled:
+								with open(f'{os.path.splitext(args.output)[0]}_latency.txt', 'w') as f:
+									f.write(latencyStats.histograms())
 						if not args.competition_mode:
 							await debug_server.reset_game()
 						await debug_server.pause_game()
@@ -190,7 +316,7 @@ class PacbotClient:
 						sys.exit(0)
 					else:
 						if args.games >= 10 and (curr_num_games % (args.games // 10) == 0):
-							print(f'{PINK}Simulation {int(curr_num_games/args.games*100)}% complete, avg score: {int(np.mean(self.scores))}, std dev: {int(np.std(self.scores))}{NORMAL}')
+							print(f'{PINK}Simulation {int(curr_num_games/args.games*100)}% complete, avg score: {int(np.mean(self.scores))}, std dev: {int(np.std(self.scores))}, frames skipped: {self.framesSkipped}/{self.framesReceived}{NORMAL}')
 						if args.delay > 0:
 							await asyncio.sleep(args.delay / 1000)
 						self.state.currLives = 3
@@ -201,16 +327,14 @@ class PacbotClient:
 					await debug_server.resume_game()
 
 				# Write a response back to the server if necessary
-				if self.state.writeServerBuf and self.state.writeServerBuf[0].tick():
-					response: bytes = self.state.writeServerBuf.popleft().getBytes()
-					if not args.competition_mode:
-						self.connection.send(response)
+				await self.tickWriteBuffer()
 
-				# Free the event loop to allow another decision
+				# Free the event loop to allow another decision (get() does not
+				# yield when a frame is already queued)
 				await asyncio.sleep(0)
 
 			# Break once the connection is closed
-			except ConnectionClosedError as e:
+			except ConnectionClosed as e:
 				print(f'{RED}Connection lost...{NORMAL}', e)
 				self.state.setConnectionStatus(False)
 				break
@@ -252,24 +376,58 @@ parser.add_argument('--debug', action='store_true', help='Enable debug mode, whe
 parser.add_argument('--games', type=int, default=-1, help='Number of games to run, -1 for infinite')
 parser.add_argument('--delay', type=int, default=0, help='Delay between games in milliseconds')
 parser.add_argument('--output', type=str, default='', help='Output file for scores')
-parser.add_argument('--strategy', choices=['astar', 'dqn'], default='astar',
-                    help='Decision strategy: astar (default) or dqn')
+parser.add_argument('--strategy', choices=list(STRATEGIES), default='astar',
+                    help='Decision strategy: astar (default), dqn or mcts')
 parser.add_argument('--checkpoint', type=str, default=_DEFAULT_CHECKPOINT,
-                    help='Path to DQN checkpoint .pt file (used when --strategy=dqn)')
+                    help='Path to DQN checkpoint .pt file, or a model exported with export_dqn.py (used when --strategy=dqn)')
 parser.add_argument('--hybrid_mode', action=argparse.BooleanOptionalAction, default=True,
                     help='(DQN only) Fall back to A* when any ghost is within 2 tiles (default: on)')
+parser.add_argument('--torch_threads', type=int, default=0,
+                    help='(DQN only) Intra-op threads for inference, 0 for torch\'s default (default: 0)')
+parser.add_argument('--dqn_lookahead', type=int, choices=[0, 1, 2], default=0,
+                    help='(DQN only) Moves to simulate before evaluating the DQN on all the resulting states '
+                         'in one batch, 0 to act greedily on the current state (default: 0)')
+parser.add_argument('--dqn_cache_size', type=int, default=256,
+                    help='(DQN only) States whose Q-values are cached, 0 to disable (default: 256)')
+parser.add_argument('--mcts_budget_ms', type=float, default=None,
+                    help='(MCTS only) Search time per decision in milliseconds (default: 60%% of a '
+                         'server frame period, 25 ms at 24 FPS)')
+parser.add_argument('--mcts_depth', type=int, default=10,
+                    help='(MCTS only) Moves per rollout (default: 10)')
+parser.add_argument('--mcts_rollouts', type=int, default=1,
+                    help='(MCTS only) Rollouts per leaf, simulated together when > 1 (default: 1)')
+parser.add_argument('--mcts_workers', type=int, default=0,
+                    help='(MCTS only) Worker processes running extra rollouts, 0 to search in-process only (default: 0)')
 parser.add_argument('--competition_mode', action=argparse.BooleanOptionalAction, default=True,
                     help='Suppress sending location updates to the game server (for physical competition use)')
 parser.add_argument('--force_no_bot', action='store_true',
                     help='Skip robot socket connection (simulate without physical bot)')
+parser.add_argument('--timing', action=argparse.BooleanOptionalAction, default=True,
+                    help='Time the decision stages, and print their latencies at the end (also written '
+                         'next to --output, as <output>_latency.txt) (default: on)')
+parser.add_argument('--coalesce_frames', action=argparse.BooleanOptionalAction, default=False,
+                    help='Only decode the newest of the frames queued up while deciding (default: off)')
+parser.add_argument('--sim_pacing', choices=PACING_POLICIES, default='fixed',
+                    help='Decision pacing without a robot: one move per 1/3 s (fixed, default), '
+                         'per 8 server ticks (ticks), or per server frame (frames)')
 
 args = parser.parse_args()
 
+latencyStats.enabled = args.timing
+
 if args.force_no_bot:
 	args.competition_mode = False
 
+# Fork the MCTS rollout workers first: before the robot socket is opened and the
+# event loop is started, so that the workers inherit neither
+rolloutPool = None
+if args.strategy == 'mcts' and args.mcts_workers > 0:
+	from RolloutPool import RolloutPool
+	rolloutPool = RolloutPool(args.mcts_workers, args.mcts_depth)
+
 import low_level
 low_level.connect(force_no_bot=args.force_no_bot)
+markStartup('imports')
 
 if __name__ == '__main__':
 	asyncio.run(main())
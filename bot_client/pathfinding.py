@@ -1,25 +1,23 @@
-import math
-import os
-from gameState import GameState
-from debugServer import DebugServer
-import json
-from json import JSONEncoder
+from functools import lru_cache
+from gameState import GameState, Directions
 import numpy as np
 
-from utils import PriorityQueue, get_distance, get_neighbors
+from utils import PriorityQueue
 from AvoidanceMap import cellAvoidanceMap
+from MazeIndex import MazeIndex, NEIGHBOR_DIRECTIONS
 
 
-def estimate_heuristic(node_pos, target_pos, cell_avoidance_map):
-    """Heuristic is based on Euclidean distance between node and target, plus cell avoidance map value."""
-    if (node_pos == (32, 32)):
-        return 0
-    return get_distance(node_pos, target_pos) + (cell_avoidance_map[node_pos] if cell_avoidance_map is not None else 0)
+@lru_cache(maxsize=None)
+def get_expansion_lists(maze: MazeIndex):
+    """Neighbor ids of every tile, in the same order as utils.get_neighbors (down, up, right, left)."""
+    order = [NEIGHBOR_DIRECTIONS.index(d) for d in (Directions.DOWN, Directions.UP, Directions.RIGHT, Directions.LEFT)]
+    return [[n for n in row if n >= 0] for row in maze.neighbors[:, order].tolist()]
 
 
 def find_path(start, target, g: GameState, avoidance_map, log: bool):
     """
     Current Pac-Man policy: A* search to find path from start to target using cell avoidance map.
+    The search runs on MazeIndex tile ids, with the heuristic precomputed for every tile.
     @param:
         - start: tuple, (row, col) of the starting point
         - target: tuple, (row, col) of the target point
@@ -32,16 +30,24 @@ def find_path(start, target, g: GameState, avoidance_map, log: bool):
     avoidance_class = avoidance_map
     avoidance_class.updateMap(g)
     avoidance_class.show_map()
-    cell_avoidance_map = avoidance_class.avoidance_map
+    maze = avoidance_class.maze
 
 
     if log:
         print(f'start: {start}, target: {target}')
 
+    # Heuristic for every tile: Euclidean distance to the target plus its avoidance score
+    drow = maze.rows.astype(np.int64) - target[0]
+    dcol = maze.cols.astype(np.int64) - target[1]
+    heuristic = (np.sqrt(dcol * dcol + drow * drow) + avoidance_class.scores).tolist()
+    neighbors = get_expansion_lists(maze)
+
+    startIdx = maze.tile_to_id[start]
+    targetIdx = maze.tile_to_id[target]
+
     frontier = PriorityQueue()
-    frontier.push(start, 0)
-    expanded = []
-    reached = {start: {"cost": estimate_heuristic(start, target, cell_avoidance_map), "parent": None}}
+    frontier.push(startIdx, 0)
+    reached = {startIdx: {"cost": heuristic[startIdx], "parent": None}}
     path = []
 
     while not frontier.empty():
@@ -49,29 +55,24 @@ def find_path(start, target, g: GameState, avoidance_map, log: bool):
         currentNode = frontier.pop()
 
         # If current node is target, retrace path
-        if currentNode == target:
+        if currentNode == targetIdx:
             retrace = currentNode
             path = []
-            while retrace is not start:
-                path.append(retrace)
+            while retrace != startIdx:
+                path.append(maze.tiles[retrace])
                 retrace = reached[retrace]["parent"]
             path.reverse()
             #print(path)
             return path
 
-        # Add current, non-goal node to the expanded list
-        expanded.append(currentNode)
-        
         # Add neighboring nodes to the frontier
-        neighbors = get_neighbors(g, currentNode)
-        for neighbor in neighbors:
-            # Get cumulative cost, g
-            g_score = reached[currentNode]['cost'] + get_distance(currentNode, neighbor)
-            
+        for neighbor in neighbors[currentNode]:
+            # Get cumulative cost, g (neighbors are always one unit apart)
+            g_score = reached[currentNode]['cost'] + 1.0
+
             if neighbor not in reached:
-                h_score = estimate_heuristic(neighbor, target, cell_avoidance_map)
                 reached[neighbor] = {"cost": g_score, "parent": currentNode}
-                frontier.push(neighbor, (g_score + h_score))
+                frontier.push(neighbor, (g_score + heuristic[neighbor]))
     
     return (0, 0)
 
@@ -82,5 +83,5 @@ if __name__ == '__main__':
     start = (1,1)
     target = (6,6)
 
-    path = find_path(start, target, g)
+    path = find_path(start, target, g, cellAvoidanceMap(g), False)
     #print(path)
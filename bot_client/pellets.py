@@ -0,0 +1,33 @@
+initPelletArr: list[int] = [
+    0b0000_0000000000000000000000000000, # row 0
+    0b0000_0111111111111001111111111110, # row 1
+    0b0000_0100001000001001000001000010, # row 2
+    0b0000_0100001000001001000001000010, # row 3
+    0b0000_0100001000001001000001000010, # row 4
+    0b0000_0111111111111111111111111110, # row 5
+    0b0000_0100001001000000001001000010, # row 6
+    0b0000_0100001001000000001001000010, # row 7
+    0b0000_0111111001111001111001111110, # row 8
+    0b0000_0000001000000000000001000000, # row 9
+    0b0000_0000001000000000000001000000, # row 10
+    0b0000_0000001000000000000001000000, # row 11
+    0b0000_0000001000000000000001000000, # row 12
+    0b0000_0000001000000000000001000000, # row 13
+    0b0000_0000001000000000000001000000, # row 14
+    0b0000_0000001000000000000001000000, # row 15
+    0b0000_0000001000000000000001000000, # row 16
+    0b0000_0000001000000000000001000000, # row 17
+    0b0000_0000001000000000000001000000, # row 18
+    0b0000_0000001000000000000001000000, # row 19
+    0b0000_0111111111111001111111111110, # row 20
+    0b0000_0100001000001001000001000010, # row 21
+    0b0000_0100001000001001000001000010, # row 22
+    0b0000_0111001111111001111111001110, # row 23
+    0b0000_0001001001000000001001001000, # row 24
+    0b0000_0001001001000000001001001000, # row 25
+    0b0000_0111111001111001111001111110, # row 26
+    0b0000_0100000000001001000000000010, # row 27
+    0b0000_0100000000001001000000000010, # row 28
+    0b0000_0111111111111111111111111110, # row 29
+    0b0000_0000000000000000000000000000  # row 30
+]
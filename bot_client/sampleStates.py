@@ -0,0 +1,71 @@
+'''
+Sample game states for benchmarks, tests and model export: random plausible
+mid-game states, and sequences of consecutive server frames from them.
+'''
+
+import random
+
+from gameState import GameState, GameModes, Directions, D_ROW, D_COL
+from MazeIndex import getMazeIndex
+from pellets import initPelletArr
+
+
+def random_state(rng: random.Random) -> GameState:
+    '''
+    Build a plausible mid-game state: a partially eaten maze, Pacman and the
+    ghosts on random walkable tiles, and occasionally frightened ghosts or a fruit
+    '''
+    tiles = getMazeIndex().tiles
+    g = GameState()
+
+    eaten = rng.random()
+    g.setPellets([row & ~sum(1 << col for col in range(28) if rng.random() < eaten) for row in initPelletArr])
+    g.gameMode = rng.choice([GameModes.SCATTER, GameModes.CHASE])
+    g.modeSteps = rng.randint(0, 180)
+    g.currTicks = rng.randint(0, 10000)
+
+    g.pacmanLoc.row, g.pacmanLoc.col = rng.choice(tiles)
+    g.pacmanLoc.setDirection(rng.choice(list(Directions)[:4]))
+    for ghost in g.ghosts:
+        ghost.location.row, ghost.location.col = rng.choice(tiles)
+        ghost.location.setDirection(rng.choice(list(Directions)[:4]))
+        ghost.frightSteps = rng.randint(1, 40) if rng.random() < 0.2 else 0
+        ghost.spawning = False
+
+    if rng.random() < 0.3:
+        g.fruitSteps = rng.randint(1, 30)
+        g.fruitLoc.row, g.fruitLoc.col = 17, 13
+
+    return g
+
+
+def random_walk(g: GameState, rng: random.Random, frames: int) -> list:
+    '''
+    Build a sequence of consecutive server frames starting from g (left untouched):
+    each frame Pacman moves one tile (eating pellets), and every other frame one ghost moves
+    '''
+    start, g = g, GameState()
+    g.update(start.serialize())
+
+    def step(location) -> None:
+        moves = [d for d in list(Directions)[:4]
+                 if not g.wallAt(location.row + D_ROW[d], location.col + D_COL[d])]
+        if moves:
+            direction = rng.choice(moves)
+            location.row += D_ROW[direction]
+            location.col += D_COL[direction]
+
+    sequence = []
+    for frame in range(frames):
+        step(g.pacmanLoc)
+        g.collectPellet(g.pacmanLoc.row, g.pacmanLoc.col)
+        if frame % 2:
+            step(rng.choice(g.ghosts).location)
+        g.currTicks += 1
+
+        # Each frame is a separate object, as if decoded from the server
+        frameState = GameState()
+        frameState.update(g.serialize())
+        sequence.append(frameState)
+
+    return sequence
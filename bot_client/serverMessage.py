@@ -4,6 +4,9 @@ class ServerMessage:
   the Pacbot server.
 	'''
 
+  # Fixed attributes, avoiding a dict per queued message
+  __slots__ = ('messageBytes', 'waitTicks')
+
   def __init__(self, messageBytes: bytes, numTicks: int):
     '''
 		Construct a new server object
@@ -0,0 +1,46 @@
+import os
+import random
+import sys
+
+import pytest
+
+# The client modules are imported by name from bot_client/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from debugServer import DebugServer
+from sampleStates import random_state
+
+
+class _SilentDebugServer:
+    '''
+    Stand-in for the debug server, ignoring every call
+    '''
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+@pytest.fixture
+def debug_server():
+    DebugServer.instance = _SilentDebugServer()
+    yield DebugServer.instance
+    del DebugServer.instance
+
+
+@pytest.fixture
+def states():
+    rng = random.Random(0)
+    return [random_state(rng) for _ in range(100)]
+
+
+@pytest.fixture
+def snapshot():
+    '''
+    Everything a simulation step can change in a game state, as a comparable tuple
+    '''
+    def snapshot(g):
+        return (g.currTicks, int(g.gameMode), g.modeSteps, g.modeDuration, g.currScore,
+                g.pacmanLoc.row, g.pacmanLoc.col, g.pacmanLoc.rowDir, g.pacmanLoc.colDir,
+                tuple((ghost.location.row, ghost.location.col, ghost.location.rowDir, ghost.location.colDir,
+                       ghost.frightSteps, ghost.spawning, int(ghost.plannedDirection)) for ghost in g.ghosts),
+                g.fruitLoc.row, g.fruitLoc.col, g.fruitSteps, tuple(g.pelletArr), g.numPellets())
+    return snapshot
@@ -0,0 +1,95 @@
+import random
+
+import numpy as np
+
+from AvoidanceMap import cellAvoidanceMap, GHOST_FIELD_CACHE_SIZE
+from sampleStates import random_walk
+
+
+def test_vectorized_update_matches_per_tile(states):
+    reference = cellAvoidanceMap(states[0])
+    vectorized = cellAvoidanceMap(states[0])
+    for g in states:
+        reference.updateMapPerTile(g)
+        vectorized.updateMap(g)
+        assert np.array_equal(vectorized.scores, reference.scores)
+        assert vectorized.avoidance_map == reference.avoidance_map
+
+
+def test_incremental_update_matches_full_rebuild(states):
+    rng = random.Random(0)
+    for start in states[:20]:
+        frames = random_walk(start, rng, 30)
+        full = cellAvoidanceMap(frames[0], incremental=False)
+        incremental = cellAvoidanceMap(frames[0], incremental=True)
+        for g in frames:
+            full.updateMap(g)
+            incremental.updateMap(g)
+            assert np.array_equal(incremental.scores, full.scores)
+            assert incremental.avoidance_map == full.avoidance_map
+
+
+def test_repeated_update_within_a_frame_is_skipped(states):
+    g = states[0]
+    avoidance = cellAvoidanceMap(g)
+    updates = avoidance.layer_stats['updates']
+    avoidance.updateMap(g)
+    avoidance.updateMap(g)
+    assert avoidance.layer_stats['updates'] == updates
+    assert avoidance.layer_stats['skipped'] == 2
+
+    g.frameCount += 1
+    avoidance.updateMap(g)
+    assert avoidance.layer_stats['updates'] == updates + 1
+
+
+def test_ghost_free(states):
+    for g in states:
+        avoidance = cellAvoidanceMap(g)
+        for tile in avoidance.maze.tiles[::7]:
+            threat = avoidance._ghost_total[avoidance.maze.tile_to_id[tile]]
+            assert avoidance.ghost_free([tile]) == (threat == 0)
+
+
+def test_map_is_shown_once_per_update(states, debug_server):
+    g = states[0]
+    avoidance = cellAvoidanceMap(g)
+    avoidance.show_map()
+    avoidance.updateMap(g)
+    avoidance.show_map()
+    assert avoidance.layer_stats['shown'] == 1
+    assert avoidance.layer_stats['show_skipped'] == 1
+
+    g.frameCount += 1
+    avoidance.updateMap(g)
+    avoidance.show_map()
+    assert avoidance.layer_stats['shown'] == 2
+
+
+def test_ghost_field_cache_is_bounded(states):
+    avoidance = cellAvoidanceMap(states[0])
+    for g in states:
+        avoidance.updateMap(g)
+    assert len(avoidance._ghost_field_cache) == GHOST_FIELD_CACHE_SIZE
+
+    # The fields of the last update are still cached
+    cached = [id(field) for field in avoidance._ghost_field_cache.values()]
+    for ghost in states[-1].ghosts:
+        assert id(avoidance.ghost_field(ghost)) in cached
+    assert len(avoidance._ghost_field_cache) == GHOST_FIELD_CACHE_SIZE
+
+
+def test_ghost_house_distances_go_through_the_exit(states):
+    avoidance = cellAvoidanceMap(states[0])
+    maze = avoidance.maze
+    assert maze.tiles[maze.house_door] == (11, 13)
+    assert maze.house_steps[(12, 13)] == 1 and maze.house_steps[(14, 11)] == 5
+
+    ghost = states[0].ghosts[0]
+    for (row, col), steps in maze.house_steps.items():
+        ghost.location.row, ghost.location.col = row, col
+        assert np.array_equal(avoidance.ghost_distances(ghost), avoidance.routes.distTable[maze.house_door] + steps)
+
+    # Off the board
+    ghost.location.row, ghost.location.col = 32, 32
+    assert avoidance.ghost_distances(ghost) is None
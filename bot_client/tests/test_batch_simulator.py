@@ -0,0 +1,75 @@
+import random
+
+import numpy as np
+
+from BatchSimulator import BatchSimulator
+from gameState import Directions, GameModes
+from sampleStates import random_state
+
+
+def test_lanes_match_simulate_action(snapshot):
+    rng = random.Random(1)
+    for _ in range(30):
+        starts = [random_state(rng) for _ in range(8)]
+        for g in starts:
+            g.updatePeriod = rng.choice([4, 8, 12])
+            g.modeSteps = rng.randint(0, 5) # mode changes within a few steps
+            if rng.random() < 0.3: # near the end of a level
+                g.setPellets([row if rng.random() < 0.1 else 0 for row in g.pelletArr])
+            for ghost in g.ghosts:
+                ghost.plannedDirection = rng.choice(list(Directions)[:5])
+                ghost.spawning = rng.random() < 0.1
+
+        # Each start twice, so that lanes sharing a start diverge
+        lanes = starts * 2
+        simulator = BatchSimulator(lanes)
+        references = [g.clone() for g in lanes]
+        alive = [True] * len(references)
+        for _ in range(12):
+            directions = np.array([rng.choice(list(Directions)[:5]) for _ in references])
+            numTicks = rng.choice([1, 4, 8, 12])
+            safe, scoreDelta = simulator.simulateAction(numTicks, directions)
+            for lane, reference in enumerate(references):
+                if not alive[lane]:
+                    continue
+                score = reference.currScore
+                alive[lane] = reference.simulateAction(numTicks, Directions(int(directions[lane])))
+                assert safe[lane] == alive[lane]
+                assert scoreDelta[lane] == reference.currScore - score
+                assert snapshot(simulator.toGameState(lane)) == snapshot(reference)
+
+
+def test_rollout_reports_survival(states):
+    rng = random.Random(0)
+    actions = [[rng.choice(list(Directions)[:4]) for _ in range(10)] for _ in range(16)]
+    for g in states[:10]:
+        survived, scores, steps = BatchSimulator([g] * 16).rollout(actions, 12)
+        for lane, plan in enumerate(actions):
+            reference, alive, score, count = g.clone(), True, g.currScore, 0
+            for direction in plan:
+                if not reference.simulateAction(12, direction):
+                    alive = False
+                    break
+                count += 1
+            assert survived[lane] == alive
+            assert steps[lane] == count
+            assert scores[lane] == reference.currScore - score
+
+
+def test_plan_table_lookup_matches_scan(states):
+    rng = random.Random(0)
+    for g in states:
+        g.gameMode = rng.choice(list(GameModes))
+        if rng.random() < 0.2: # targets beyond the plan table's reach
+            g.pacmanLoc.row, g.pacmanLoc.col = rng.randrange(64), rng.randrange(64)
+        for ghost in g.ghosts:
+            ghost.spawning = False
+            ghost.location.row, ghost.location.col = rng.randrange(32), rng.randrange(32)
+            ghost.location.rowDir, ghost.location.colDir = rng.choice([(-1, 0), (1, 0), (0, -1), (0, 1), (0, 0)])
+    simulator = BatchSimulator(states)
+    simulator.plannedDirection[:] = int(Directions.NONE)
+    simulator.guessPlan(np.ones((len(states), 4), dtype=bool))
+    for lane, g in enumerate(states):
+        for i, ghost in enumerate(g.ghosts):
+            ghost.guessPlanScan()
+            assert simulator.plannedDirection[lane, i] == ghost.plannedDirection
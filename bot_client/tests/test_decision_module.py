@@ -0,0 +1,11 @@
+from decisionModule import DecisionModule
+
+
+def test_astar_strategy_takes_ghost_free_routes_from_the_table(states, debug_server):
+    decisionModule = DecisionModule(states[0], False)
+    for g in states:
+        decisionModule.state = g
+        decisionModule.update_target_loc()
+    assert decisionModule.route_stats['table'] > 0
+    assert decisionModule.route_stats['search'] > 0
+
@@ -0,0 +1,94 @@
+import random
+
+from gameState import GameState, GameModes, Directions, D_ROW, D_COL, regionMask
+
+
+def test_decoding_a_serialized_state_round_trips(states):
+    decoded = GameState()
+    for g in states:
+        decoded.update(g.serialize())
+        assert decoded.serialize() == g.serialize()
+        assert decoded.numPellets() == g.numPellets()
+
+
+def test_clone_is_independent(states, snapshot):
+    rng = random.Random(0)
+    for g in states:
+        before = snapshot(g)
+        clone = g.clone()
+        assert snapshot(clone) == before
+        for _ in range(10):
+            clone.simulateAction(12, rng.choice(list(Directions)[:4]))
+        assert snapshot(g) == before
+
+
+def test_restore_returns_to_the_snapshot(states, snapshot):
+    rng = random.Random(0)
+    for g in states:
+        root = g.clone()
+        for _ in range(5):
+            g.simulateAction(12, rng.choice(list(Directions)[:4]))
+        g.restore(root)
+        assert snapshot(g) == snapshot(root)
+
+
+def test_ghost_plan_table_matches_scan(states):
+    rng = random.Random(0)
+    for g in states * 20:
+        g.gameMode = rng.choice(list(GameModes))
+        for ghost in g.ghosts:
+            if rng.random() < 0.2: # possibly off-grid positions and headings
+                ghost.location.row, ghost.location.col = rng.randrange(32), rng.randrange(32)
+                ghost.location.rowDir, ghost.location.colDir = rng.randrange(-2, 2), rng.randrange(-2, 2)
+        for ghost in g.ghosts:
+            ghost.plannedDirection = Directions.NONE
+            ghost.guessPlanScan()
+            scanned = ghost.plannedDirection
+            ghost.plannedDirection = Directions.NONE
+            ghost.guessPlan()
+            assert ghost.plannedDirection == scanned
+
+
+def test_pellet_counter_stays_in_sync(states):
+    rng = random.Random(0)
+    for g in states:
+        assert g.numPellets() == g.countPellets()
+        for _ in range(30):
+            g.simulateAction(8, rng.choice(list(Directions)[:4]))
+            assert g.numPellets() == g.countPellets()
+
+
+def test_pellets_in_region(states):
+    rng = random.Random(0)
+    for g in states:
+        rowMin, rowMax = sorted((rng.randrange(-3, 34), rng.randrange(-3, 34)))
+        colMin, colMax = sorted((rng.randrange(-3, 31), rng.randrange(-3, 31)))
+        expected = sum(g.pelletAt(row, col) for row in range(max(rowMin, 0), min(rowMax, 30) + 1)
+                       for col in range(max(colMin, 0), min(colMax, 27) + 1))
+        assert g.pelletsInRegion(regionMask(rowMin, rowMax, colMin, colMax)) == expected
+
+
+def test_nearest_pellet_along(states):
+    rng = random.Random(0)
+    for g in states:
+        row, col = rng.randrange(-1, 32), rng.randrange(-1, 29)
+        for direction in list(Directions)[:4]:
+            expected = -1
+            if 0 <= row < 31 and 0 <= col < 28:
+                steps, r, c = 0, row, col
+                while True:
+                    r, c, steps = r + D_ROW[direction], c + D_COL[direction], steps + 1
+                    if g.wallAt(r, c):
+                        break
+                    if g.pelletAt(r, c):
+                        expected = steps
+                        break
+            assert g.nearestPelletAlong(row, col, direction) == expected
+
+
+def test_frame_status_matches_the_decoded_state(states):
+    scratch = GameState()
+    for g in states:
+        message = g.serialize()
+        scratch.update(message)
+        assert GameState().frameStatus(message) == (int(scratch.gameMode), scratch.currLevel, scratch.currLives)
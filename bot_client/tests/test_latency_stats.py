@@ -0,0 +1,22 @@
+from LatencyStats import LatencyStats, MAX_SAMPLES
+
+
+def test_only_the_latest_samples_are_kept():
+    stats = LatencyStats()
+    for i in range(MAX_SAMPLES + 10):
+        stats.record('frame_to_command', i)
+        with stats.span('get_direction'):
+            pass
+    assert len(stats.samples['frame_to_command']) == len(stats.samples['get_direction']) == MAX_SAMPLES
+    assert stats.samples['frame_to_command'][0] == 10
+    assert 'n=10000' in stats.summary()
+
+
+def test_nothing_is_recorded_while_disabled():
+    stats = LatencyStats()
+    stats.enabled = False
+    stats.record('frame_to_command', 0.001)
+    with stats.span('get_direction'):
+        pass
+    assert not stats.samples
+    assert stats.summary() == ''
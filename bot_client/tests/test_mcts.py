@@ -0,0 +1,23 @@
+import random
+
+from DistMatrix import RoutingTable
+from mcts_module import MCTSDecisionModule, default_budget_ms, rollout
+
+
+def test_rollout_stops_at_the_deadline(states):
+    routes = RoutingTable(states[0])
+    for g in states[:20]:
+        _, steps = rollout(g, 10, routes, random.Random(0), deadline=0)
+        assert steps == 1
+
+
+def test_search_stays_within_the_budget(states):
+    # The default budget ends well before the next server frame (24 FPS)
+    assert MCTSDecisionModule(states[0]).budget * 1000 == default_budget_ms() < 1000 / 24
+
+    # Out of time right away: one iteration, whose rollout is cut after its first move
+    for g in states[:20]:
+        mcts = MCTSDecisionModule(g, budget_ms=0)
+        mcts.search()
+        assert mcts.stats['iterations'] == 1
+        assert mcts.stats['steps'] <= 1
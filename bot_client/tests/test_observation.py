@@ -0,0 +1,33 @@
+import random
+
+import numpy as np
+
+from DQNObservation import DQNObservation, buildObservation, observationKey
+from sampleStates import random_walk
+
+
+def frames(states):
+    '''
+    Consecutive frames from random walks, with the ghost positions of the previous frame
+    '''
+    rng = random.Random(0)
+    for start in states[:20]:
+        lastGhostPos = [(32, 32)] * 4
+        for frame in random_walk(start, rng, 50):
+            yield frame, lastGhostPos
+            lastGhostPos = [(ghost.location.row, ghost.location.col) for ghost in frame.ghosts]
+
+
+def test_incremental_observation_is_bit_identical(states):
+    builder = DQNObservation(tuple(states[0].wallArr))
+    for frame, lastGhostPos in frames(states):
+        expected = buildObservation(frame, lastGhostPos)
+        assert np.array_equal(builder.build(frame, lastGhostPos).view(np.uint32), expected.view(np.uint32))
+
+
+def test_equal_keys_have_equal_observations(states):
+    observed = {}
+    for frame, lastGhostPos in frames(states):
+        obs = buildObservation(frame, lastGhostPos)
+        assert np.array_equal(observed.setdefault(observationKey(frame, lastGhostPos), obs), obs)
+    assert len(observed) > 1
@@ -0,0 +1,53 @@
+import os
+import random
+import shutil
+
+import numpy as np
+
+from gameState import GameState, Directions, D_ROW, D_COL
+import DistMatrix
+from DistMatrix import RoutingTable, UNREACHABLE
+
+
+def test_paths_follow_the_distance_table():
+    g = GameState()
+    routes = RoutingTable(g)
+    rng = random.Random(0)
+    for _ in range(500):
+        src, dst = rng.choice(routes.maze.tiles), rng.choice(routes.maze.tiles)
+        path = routes.path(src, dst)
+        assert len(path) == routes.distance(src, dst) != UNREACHABLE
+        assert path == [] if src == dst else path[-1] == dst
+
+        # Every step moves to an adjacent walkable tile
+        for (row, col), (nextRow, nextCol) in zip([src] + path, path):
+            assert abs(nextRow - row) + abs(nextCol - col) == 1
+            assert not g.wallAt(nextRow, nextCol)
+
+        direction = routes.next_step(src, dst)
+        if src == dst:
+            assert direction == Directions.NONE
+        else:
+            assert (src[0] + D_ROW[direction], src[1] + D_COL[direction]) == path[0]
+
+
+
+def test_tables_are_rebuilt_for_different_walls(tmp_path, monkeypatch):
+    # Start from the committed tables, as if they had been cached for the competition maze
+    for name in ('DIST_TABLE_PATH', 'NEXT_HOP_PATH', 'WALL_HASH_PATH'):
+        path = tmp_path / os.path.basename(getattr(DistMatrix, name))
+        shutil.copy(getattr(DistMatrix, name), path)
+        monkeypatch.setattr(DistMatrix, name, str(path))
+    original = RoutingTable(GameState())
+    originalDist = np.array(original.distTable) # the file is memory mapped, and about to be rewritten
+
+    # Open a dead end at (24, 1) and close the corner at (29, 1): the number of tiles stays the same
+    g = GameState()
+    g.wallArr = list(g.wallArr)
+    g.wallArr[24] &= ~(1 << 1)
+    g.wallArr[29] |= 1 << 1
+    routes = RoutingTable(g)
+    assert routes.maze.num_tiles == original.maze.num_tiles
+    assert routes.distance((23, 1), (24, 1)) == 1
+    assert not np.array_equal(routes.distTable, originalDist)
+    assert DistMatrix.loadWallHash(DistMatrix.WALL_HASH_PATH) == routes.maze.wall_hash
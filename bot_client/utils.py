@@ -2,6 +2,7 @@ import heapq
 import math
 
 from gameState import GameState
+from MazeIndex import getMazeIndex
 
 class PriorityQueue:
     """
@@ -35,12 +36,7 @@ def get_walkable_tiles(g: GameState):
     if g.walkable_cells is not None:
         return g.walkable_cells
     
-    walkable_cells = set()
-    for row in range(31):
-        for col in range(28):
-            if not g.wallAt(row, col):
-                walkable_cells.add((row, col))
-                
+    walkable_cells = set(getMazeIndex(tuple(g.wallArr)).tiles)
     g.walkable_cells = walkable_cells
     return walkable_cells
 